@@ -0,0 +1,194 @@
+import argparse
+import contextlib
+import csv
+import json
+import os
+import sys
+import time
+from forecast_snapshot import load_or_ingest, find_run_ids
+from forecast_store import run_csv_paths, location_records
+from weather_report import create_llm, resolve_location, collect_forecast_data, build_synthesis_prompt, forecast_period
+from narrative import render_report
+
+# --- Configuration ---
+# Report items handled per llm.batch call; results are written out after every chunk
+BATCH_CHUNK_SIZE = 50
+# Synthesis requests in flight at once within a chunk
+BATCH_MAX_CONCURRENCY = 8
+
+
+def log(message):
+    """Progress messages go to stderr so reports can be streamed to stdout."""
+    print(message, file=sys.stderr)
+
+
+# --- Input ---
+def read_location_names(stream):
+    """Yields one location name per non-empty line, skipping '#' comments."""
+    for line in stream:
+        name = line.strip()
+        if name and not name.startswith("#"):
+            yield name
+
+
+def plan_report_items(store, location_index, names, expand):
+    """Yields one report item per location name, or per matched location when expand is set.
+
+    Each item is {"query", "label", "resolved_name", "rows"}; label is what the report is written for.
+    """
+    for name in names:
+        rows, resolved_name, _ = resolve_location(location_index, name)
+        if expand and len(rows) > 1:
+            for i in range(len(rows)):
+                village, mandal, district = store.location_names[rows[i]]
+                yield {"query": name, "label": f"{village}, {mandal}, {district}", "resolved_name": resolved_name, "rows": rows[i:i + 1]}
+        else:
+            yield {"query": name, "label": resolved_name or name, "resolved_name": resolved_name, "rows": rows}
+
+
+def chunked(items, size):
+    """Yields lists of up to size items."""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# --- Synthesis ---
+def synthesize_chunk(llm, store, chunk, max_concurrency, synthesis_mode="llm"):
+    """Fills item["report"] for every item in chunk, sending all prompts in one llm.batch call.
+
+    synthesis_mode is "llm", "template" (no LLM calls), "auto" (template for failed LLM
+    requests) or None (no report).
+    """
+    pending = []
+    for item in chunk:
+        raw_results, found = collect_forecast_data(store, item["rows"], item["label"])
+        if not found:
+            item["report"] = f"Location '{item['query']}' not found in any available forecast dataset."
+        elif synthesis_mode is None:
+            item["report"] = None
+        elif synthesis_mode == "template":
+            item["report"] = render_report(store, item["rows"])
+        else:
+            pending.append((item, build_synthesis_prompt(item["label"], raw_results, *forecast_period(store))))
+    if not pending:
+        return
+    responses = llm.batch([prompt for _, prompt in pending], config={"max_concurrency": max_concurrency}, return_exceptions=True)
+    for (item, _), response in zip(pending, responses):
+        if isinstance(response, Exception):
+            log(f"Synthesis failed for '{item['label']}': {response}")
+            if synthesis_mode == "auto":
+                item["report"] = render_report(store, item["rows"])
+            else:
+                item["report"] = None
+                item["error"] = str(response)
+        else:
+            item["report"] = response.content
+
+
+# --- Output ---
+class JsonlReportWriter:
+    """Writes one JSON object per report item."""
+
+    def __init__(self, out, store):
+        self.out = out
+        self.store = store
+
+    def write(self, item):
+        record = {
+            "query": item["query"],
+            "resolved_name": item["resolved_name"],
+            "match_count": len(item["rows"]),
+            "locations": location_records(self.store, item["rows"], max_matches=len(item["rows"])),
+            "report": item.get("report"),
+        }
+        if "error" in item:
+            record["error"] = item["error"]
+        self.out.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class CsvReportWriter:
+    """Writes one CSV row per matched location, with a "<parameter> <date>" column per value."""
+
+    def __init__(self, out, store):
+        self.store = store
+        self.value_columns = [f"{param} {date}" for param in store.parameters for date in store.dates]
+        self.writer = csv.writer(out)
+        self.writer.writerow(["query", "resolved_name", "SP_CODE", "VILLAGE", "MANDAL", "DISTRICT"] + self.value_columns + ["report"])
+
+    def write(self, item):
+        records = location_records(self.store, item["rows"], max_matches=len(item["rows"]))
+        if not records:
+            self.writer.writerow([item["query"], item["resolved_name"] or "", "", "", "", ""] + [""] * len(self.value_columns) + [item.get("report") or ""])
+        for record in records:
+            values = [record["forecast"][param][date] for param in self.store.parameters for date in self.store.dates]
+            self.writer.writerow(
+                [item["query"], item["resolved_name"] or "", record["sp_code"], record["village"], record["mandal"], record["district"]]
+                + ["" if value is None else value for value in values]
+                + [item.get("report") or ""]
+            )
+
+
+# --- Batch Run ---
+def run_batch(store, location_index, names, writer, out, llm=None, expand=False, chunk_size=BATCH_CHUNK_SIZE, max_concurrency=BATCH_MAX_CONCURRENCY, synthesis_mode="llm"):
+    """Generates and writes a report for every location name. Returns the number of items written."""
+    written = 0
+    start = time.perf_counter()
+    for chunk in chunked(plan_report_items(store, location_index, names, expand), chunk_size):
+        synthesize_chunk(llm, store, chunk, max_concurrency, synthesis_mode)
+        for item in chunk:
+            writer.write(item)
+        out.flush()
+        written += len(chunk)
+        elapsed = time.perf_counter() - start
+        log(f"{written} report(s) written ({written / elapsed:.1f}/s).")
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate weather forecast reports for a list of locations.")
+    parser.add_argument("input", help="File with one Village/Mandal/District name per line ('-' for stdin)")
+    parser.add_argument("-o", "--output", default="-", help="Output file ('-' for stdout, the default)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    parser.add_argument("--data-dir", default=".", help="Directory containing the forecast CSVs (and snapshots/)")
+    parser.add_argument("--run", dest="run_id", default=None, help="Forecast run ID, e.g. 2025040812_UTC (default: newest)")
+    parser.add_argument("--expand", action="store_true", help="One report per matched location (e.g. every village of a mandal)")
+    parser.add_argument("--synthesis", choices=["llm", "template", "auto"], default="llm", help="How reports are written: Gemini, local templates, or Gemini with template fallback")
+    parser.add_argument("--no-report", action="store_true", help="Only write the forecast data, without any report")
+    parser.add_argument("--concurrency", type=int, default=BATCH_MAX_CONCURRENCY, help="Synthesis requests in flight at once")
+    parser.add_argument("--chunk-size", type=int, default=BATCH_CHUNK_SIZE, help="Report items per LLM batch")
+    args = parser.parse_args()
+
+    run_id = args.run_id or (find_run_ids(args.data_dir) or [None])[-1]
+    if not run_id:
+        log(f"No forecast runs found in {args.data_dir}.")
+        sys.exit(1)
+    # Loading messages must not end up in a report stream written to stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        store, location_index = load_or_ingest(run_csv_paths(args.data_dir, run_id), os.path.join(args.data_dir, "snapshots"))
+        if store is None:
+            log(f"Forecast run {run_id} could not be loaded.")
+            sys.exit(1)
+        llm = None if args.no_report or args.synthesis == "template" else create_llm()
+
+    in_stream = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    try:
+        writer = (CsvReportWriter if args.format == "csv" else JsonlReportWriter)(out, store)
+        synthesis_mode = None if args.no_report else args.synthesis
+        written = run_batch(store, location_index, read_location_names(in_stream), writer, out, llm, args.expand, args.chunk_size, args.concurrency, synthesis_mode)
+        log(f"Done: {written} report(s) for run {run_id}.")
+    finally:
+        if in_stream is not sys.stdin:
+            in_stream.close()
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
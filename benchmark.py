@@ -0,0 +1,415 @@
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import multi_weather_chatbot
+from concurrent_fetch import fetch_all
+from forecast_runs import ForecastRun
+from forecast_snapshot import load_or_ingest, find_run_ids
+from forecast_store import run_csv_paths
+from regional_stats import parse_regional_query, answer_regional_query
+from spatial_index import parse_spatial_query
+from weather_report import resolve_location, resolve_coordinates, collect_forecast_data, collect_point_data, REPORT_PARAMETERS
+
+# --- Configuration ---
+BENCHMARK_SEED = 42
+CORPUS_SIZE = 2000
+# Share of each query kind in the generated corpus
+QUERY_MIX = {"village": 0.45, "mandal": 0.15, "district": 0.05, "misspelled": 0.15, "coordinate": 0.12, "regional": 0.08}
+# Simulated LLM latency per call (seconds); the fake model answers instantly otherwise
+FAKE_LLM_LATENCY = 0.2
+FAKE_LLM_JITTER = 0.0
+# Share of prompts the fake model fails on (fixed per prompt), e.g. to exercise the "auto" template fallback
+FAKE_LLM_ERROR_RATE = 0.0
+# Fake LLM round trips per parameter agent in agent retrieval mode (a ReAct agent takes several)
+FAKE_AGENT_STEPS = 3
+CONCURRENT_USERS = [1, 8, 32]
+TURNS_PER_USER = 20
+FANOUT_ROUNDS = 50
+
+REGIONAL_TEMPLATES = [
+    "max wind per district",
+    "average temperature per mandal in {district}",
+    "which mandals in {district} expect more than 2 units of rain",
+    "villages in {district} with heat index above 44",
+    "total rain per district on {date}",
+    "districts with average humidity > 60",
+]
+
+
+def log(message):
+    print(message, file=sys.stderr)
+
+
+# --- Fake LLM ---
+class FakeMessage:
+    def __init__(self, content, prompt_tokens, completion_tokens):
+        self.content = content
+        self.usage_metadata = {"input_tokens": prompt_tokens, "output_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+
+class FakeChatModel:
+    """Deterministic stand-in for ChatGoogleGenerativeAI: same methods, fixed latency, no network.
+
+    The answer, the jitter and whether the call fails depend only on the
+    prompt, so benchmark runs are repeatable.
+    """
+
+    def __init__(self, latency=FAKE_LLM_LATENCY, jitter=FAKE_LLM_JITTER, error_rate=FAKE_LLM_ERROR_RATE):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _respond(self, prompt):
+        digest = hashlib.sha1(str(prompt).encode("utf-8")).digest()
+        delay = self.latency + self.jitter * (digest[0] / 255.0)
+        content = f"**Local Weather Forecast**\nSynthetic report {digest.hex()[:12]}."
+        with self._lock:
+            self.calls += 1
+        error = RuntimeError(f"Fake LLM error {digest.hex()[:12]}") if digest[1] / 255.0 < self.error_rate else None
+        return delay, error, FakeMessage(content, len(str(prompt)) // 4, len(content) // 4)
+
+    def invoke(self, prompt, *args, **kwargs):
+        delay, error, message = self._respond(prompt)
+        time.sleep(delay)
+        if error is not None:
+            raise error
+        return message
+
+    def batch(self, prompts, config=None, return_exceptions=False):
+        """Like Runnable.batch: results in prompt order; with return_exceptions a failed call yields its exception."""
+        def call(prompt):
+            try:
+                return self.invoke(prompt)
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                return e
+
+        max_concurrency = (config or {}).get("max_concurrency") or len(prompts) or 1
+        with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+            return list(pool.map(call, prompts))
+
+    async def astream(self, prompt, *args, **kwargs):
+        delay, error, message = self._respond(prompt)
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        for word in message.content.split(" "):
+            yield FakeMessage(word + " ", 0, 1)
+
+
+class FakeAgent:
+    """Stand-in for a parameter's CSV agent: FAKE_AGENT_STEPS fake LLM round trips, then one data line."""
+
+    def __init__(self, llm, param, steps=FAKE_AGENT_STEPS):
+        self.llm = llm
+        self.param = param
+        self.steps = steps
+
+    def invoke(self, inputs):
+        for step in range(self.steps):
+            message = self.llm.invoke(f"{inputs['input']}\nStep {step + 1}")
+        return {"output": f"Location: (synthetic). Data: {self.param} {message.content}"}
+
+
+class PinnedRuns:
+    """Stands in for the chatbot's run manager: always the benchmarked run, no directory watching."""
+
+    def __init__(self, run):
+        self.run = run
+
+    def current(self):
+        return self.run
+
+    def stop(self):
+        pass
+
+
+def install_chatbot(run, llm, retrieval_mode, synthesis_mode):
+    """Points multi_weather_chatbot at run and the fake model through its component registry.
+
+    The benchmarked turns then go through answer_turn exactly as in the chatbot:
+    response cache, tracing, agent or native retrieval, spatial and regional routing.
+    """
+    multi_weather_chatbot.RETRIEVAL_MODE = retrieval_mode
+    multi_weather_chatbot.SYNTHESIS_MODE = synthesis_mode
+    components = multi_weather_chatbot.components
+    components.register("llm", lambda: llm, replace=True)
+    components.register("forecast_runs", lambda: PinnedRuns(run), replace=True)
+    multi_weather_chatbot.on_new_run(run)
+    if retrieval_mode == "agent":
+        for param in run.csv_paths:
+            components.register(multi_weather_chatbot.agent_name(run, param), lambda param=param: FakeAgent(llm, param), replace=True)
+
+
+# --- Query Corpus ---
+def misspell(name, rng):
+    """Drops, doubles or swaps one inner character (names shorter than 5 are returned as is)."""
+    if len(name) < 5:
+        return name
+    i = int(rng.integers(1, len(name) - 2))
+    edit = int(rng.integers(3))
+    if edit == 0:
+        return name[:i] + name[i + 1:]
+    if edit == 1:
+        return name[:i] + name[i] + name[i:]
+    return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+
+
+def build_query_corpus(store, size=CORPUS_SIZE, seed=BENCHMARK_SEED):
+    """Returns [(kind, query)] drawn from the real location names and coordinates of the store."""
+    rng = np.random.default_rng(seed)
+    names = store.location_names
+    lons = store.metadata["LON"].to_numpy(dtype=np.float64)
+    lats = store.metadata["LAT"].to_numpy(dtype=np.float64)
+    districts = sorted(set(names[:, 2]))
+    kinds = list(QUERY_MIX)
+    corpus = []
+    for kind in rng.choice(kinds, size=size, p=np.array(list(QUERY_MIX.values())) / sum(QUERY_MIX.values())):
+        row = int(rng.integers(len(names)))
+        if kind == "village":
+            query = names[row, 0]
+        elif kind == "mandal":
+            query = names[row, 1]
+        elif kind == "district":
+            query = names[row, 2]
+        elif kind == "misspelled":
+            query = misspell(names[row, 0], rng)
+        elif kind == "coordinate":
+            lat, lon = lats[row] + rng.normal(0, 0.02), lons[row] + rng.normal(0, 0.02)
+            query = f"near {lat:.4f}, {lon:.4f}" if rng.random() < 0.7 else f"{lat:.4f}, {lon:.4f} within {int(rng.integers(2, 15))} km"
+        else:
+            template = REGIONAL_TEMPLATES[int(rng.integers(len(REGIONAL_TEMPLATES)))]
+            query = template.format(district=districts[int(rng.integers(len(districts)))], date=store.dates[int(rng.integers(len(store.dates)))])
+        corpus.append((str(kind), query))
+    return corpus
+
+
+# --- Measurement ---
+def summarize(durations, wall_seconds=None):
+    """Returns count, throughput (ops/s) and p50/p99/mean/max in milliseconds."""
+    values = np.sort(np.asarray(durations, dtype=np.float64)) * 1000
+    if not len(values):
+        return {"count": 0}
+    wall = wall_seconds if wall_seconds is not None else values.sum() / 1000
+    return {
+        "count": int(len(values)),
+        "throughput_per_s": round(len(values) / wall, 1) if wall > 0 else None,
+        "p50_ms": round(float(np.percentile(values, 50)), 4),
+        "p99_ms": round(float(np.percentile(values, 99)), 4),
+        "mean_ms": round(float(values.mean()), 4),
+        "max_ms": round(float(values[-1]), 4),
+    }
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+# --- Stages ---
+def resolve_query(run, query):
+    """The lookup a turn does before any data is extracted. Returns ("regional"|"point"|"location", resolved)."""
+    regional_query = parse_regional_query(query)
+    if regional_query:
+        return "regional", regional_query
+    spatial_query = parse_spatial_query(query)
+    if spatial_query:
+        lat, lon, radius_km = spatial_query
+        rows, distances, _ = resolve_coordinates(run.spatial_index, lat, lon, radius_km)
+        return "point", (rows, distances, lat, lon)
+    return "location", resolve_location(run.location_index, query)[0]
+
+
+def extract_data(run, kind, resolved, query):
+    """The data extraction a turn does for a resolved query."""
+    if kind == "regional":
+        try:
+            return answer_regional_query(run.regional_stats, resolved)
+        except ValueError:
+            return None
+    if kind == "point":
+        rows, distances, lat, lon = resolved
+        return collect_point_data(run.store, rows, distances, lat, lon)
+    return collect_forecast_data(run.store, resolved, query)
+
+
+def full_turn(query):
+    """One chatbot turn through multi_weather_chatbot.answer_turn (see install_chatbot), traced as in the chat loop."""
+    with multi_weather_chatbot.tracer.trace(query, retrieval_mode=multi_weather_chatbot.RETRIEVAL_MODE, synthesis_mode=multi_weather_chatbot.SYNTHESIS_MODE):
+        multi_weather_chatbot.answer_turn(query)
+
+
+def bench_resolution(run, corpus):
+    results = {}
+    by_kind = {}
+    start = time.perf_counter()
+    for kind, query in corpus:
+        duration, _ = timed(resolve_query, run, query)
+        by_kind.setdefault(kind, []).append(duration)
+    wall = time.perf_counter() - start
+    results["resolution"] = summarize([d for durations in by_kind.values() for d in durations], wall)
+    for kind, durations in sorted(by_kind.items()):
+        results[f"resolution:{kind}"] = summarize(durations)
+    return results
+
+
+def bench_extraction(run, corpus):
+    resolved = [(kind, query) + resolve_query(run, query) for kind, query in corpus]
+    by_kind = {}
+    start = time.perf_counter()
+    for kind, query, resolved_kind, value in resolved:
+        duration, _ = timed(extract_data, run, resolved_kind, value, query)
+        by_kind.setdefault(kind, []).append(duration)
+    wall = time.perf_counter() - start
+    results = {"extraction": summarize([d for durations in by_kind.values() for d in durations], wall)}
+    for kind, durations in sorted(by_kind.items()):
+        results[f"extraction:{kind}"] = summarize(durations)
+    return results
+
+
+def bench_fanout(llm, rounds):
+    """Parallel fan-out of one fake LLM call per parameter through fetch_all (as in agent mode)."""
+    tasks = {param: (lambda param=param: llm.invoke(f"Get {param} data")) for param in REPORT_PARAMETERS}
+    durations = []
+    start = time.perf_counter()
+    for _ in range(rounds):
+        duration, _ = timed(fetch_all, tasks, 60)
+        durations.append(duration)
+    result = summarize(durations, time.perf_counter() - start)
+    # Ideal is one LLM latency per round; the rest is fan-out overhead (or queueing behind the pool)
+    result["overhead_p50_ms"] = round(result["p50_ms"] - llm.latency * 1000, 4)
+    return {"fanout": result}
+
+
+def bench_full_turns(corpus, users, turns_per_user):
+    """users threads each run turns_per_user consecutive turns from the corpus.
+
+    The response cache starts empty, so every user count sees the same mix of
+    misses and repeated questions. The chatbot's printed replies are discarded.
+    """
+    durations = []
+    errors = []
+    lock = threading.Lock()
+
+    def user(index):
+        for turn in range(turns_per_user):
+            _, query = corpus[(index * turns_per_user + turn) % len(corpus)]
+            start = time.perf_counter()
+            try:
+                full_turn(query)
+            except Exception as e:
+                with lock:
+                    errors.append(e)
+            with lock:
+                durations.append(time.perf_counter() - start)
+
+    multi_weather_chatbot.response_cache.clear()
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        with ThreadPoolExecutor(max_workers=users) as pool:
+            list(pool.map(user, range(users)))
+    result = summarize(durations, time.perf_counter() - start)
+    result["errors"] = len(errors)
+    if errors:
+        log(f"{len(errors)} turn(s) failed, e.g.: {errors[0]}")
+    return result
+
+
+# --- Reporting ---
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = None
+    return {"commit": commit or None, "python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(), "cpus": os.cpu_count(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def format_results(results, baseline=None):
+    lines = [f"{'benchmark':<28} {'count':>7} {'ops/s':>10} {'p50 ms':>10} {'p99 ms':>10}" + ("   p50 vs baseline" if baseline else "")]
+    for name, stats in results.items():
+        if not stats.get("count"):
+            continue
+        line = f"{name:<28} {stats['count']:>7} {stats['throughput_per_s'] or 0:>10.1f} {stats['p50_ms']:>10.3f} {stats['p99_ms']:>10.3f}"
+        previous = (baseline or {}).get(name)
+        if previous and previous.get("p50_ms"):
+            line += f"   {stats['p50_ms'] / previous['p50_ms']:>6.2f}x"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline performance benchmark with a fake LLM (no API key or network needed).")
+    parser.add_argument("--data-dir", default=".", help="Directory containing the forecast CSVs (and snapshots/)")
+    parser.add_argument("--run", dest="run_id", default=None, help="Forecast run ID (default: newest)")
+    parser.add_argument("--queries", type=int, default=CORPUS_SIZE, help="Size of the generated query corpus")
+    parser.add_argument("--seed", type=int, default=BENCHMARK_SEED)
+    parser.add_argument("--llm-latency", type=float, default=FAKE_LLM_LATENCY, help="Seconds per fake LLM call")
+    parser.add_argument("--llm-jitter", type=float, default=FAKE_LLM_JITTER, help="Extra 0..N seconds per call, fixed per prompt")
+    parser.add_argument("--users", type=lambda text: [int(n) for n in text.split(",")], default=CONCURRENT_USERS, help="Comma-separated concurrent user counts")
+    parser.add_argument("--turns-per-user", type=int, default=TURNS_PER_USER)
+    parser.add_argument("--fanout-rounds", type=int, default=FANOUT_ROUNDS)
+    parser.add_argument("--llm-error-rate", type=float, default=FAKE_LLM_ERROR_RATE, help="Share of prompts the fake model fails on")
+    parser.add_argument("--retrieval", choices=["native", "agent"], default="native", help="Retrieval mode of the full turns (agent: fake CSV agents)")
+    parser.add_argument("--synthesis", choices=["llm", "template", "auto"], default="llm", help="Synthesis mode of the full turns")
+    parser.add_argument("-o", "--output", help="Write the results as JSON (to compare later runs against)")
+    parser.add_argument("--compare", help="Results JSON of an earlier run to show p50 ratios against")
+    args = parser.parse_args()
+
+    run_id = args.run_id or (find_run_ids(args.data_dir) or [None])[-1]
+    if not run_id:
+        log(f"No forecast runs found in {args.data_dir}.")
+        sys.exit(1)
+    with contextlib.redirect_stdout(sys.stderr):
+        csv_paths = run_csv_paths(args.data_dir, run_id)
+        load_seconds, (store, location_index) = timed(load_or_ingest, csv_paths, os.path.join(args.data_dir, "snapshots"))
+        if store is None:
+            log(f"Forecast run {run_id} could not be loaded.")
+            sys.exit(1)
+        run = ForecastRun(run_id, store, location_index, csv_paths)
+        run.preload()  # Keeps the one-off index builds out of the first query's latency
+
+    llm = FakeChatModel(args.llm_latency, args.llm_jitter, args.llm_error_rate)
+    with contextlib.redirect_stdout(sys.stderr):
+        install_chatbot(run, llm, args.retrieval, args.synthesis)
+    corpus = build_query_corpus(store, args.queries, args.seed)
+    log(f"Benchmarking run {run_id}: {len(store)} locations, {len(corpus)} queries, fake LLM latency {args.llm_latency}s.")
+
+    results = {"load": summarize([load_seconds])}
+    results.update(bench_resolution(run, corpus))
+    results.update(bench_extraction(run, corpus))
+    log("Fan-out...")
+    with contextlib.redirect_stdout(sys.stderr):  # fetch_all prints the tracebacks of failed fake calls
+        results.update(bench_fanout(llm, args.fanout_rounds))
+    for users in args.users:
+        log(f"Full turns with {users} concurrent user(s)...")
+        results[f"turn:{users}_users"] = bench_full_turns(corpus, users, args.turns_per_user)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    print(format_results(results, baseline))
+
+    if args.output:
+        config = {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "config": dict(config, run_id=run_id), "results": results}, f, indent=2)
+        log(f"Results written to {args.output}.")
+
+
+if __name__ == "__main__":
+    main()
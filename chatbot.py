@@ -1,45 +1,46 @@
+import csv
 import os
-import pandas as pd
-from dotenv import load_dotenv
-import google.generativeai as genai
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.agents.agent_types import AgentType
-from langchain_experimental.agents.agent_toolkits import create_csv_agent # Use the experimental agent
+from components import LazyComponents
 
+# LangChain, Gemini and pandas are imported when the LLM and the agent are first created,
+# so the prompt appears without waiting for them.
 
 
 # --- Configuration ---
 CSV_FILE_PATH = "/Users/sravva/Documents/Test/aware/RF_day2025040812_UTC.csv" # Make sure this file exists
 
+# Create the LLM and the agent in the background while the user types the first question (False: on first use)
+PRELOAD_IN_BACKGROUND = True
+
 
 # --- Load API Key ---
-load_dotenv()
-api_key = os.getenv("GOOGLE_API_KEY")
+def load_api_key():
+    """Reads GOOGLE_API_KEY from the environment or .env and configures the Google Generative AI client."""
+    from dotenv import load_dotenv
+    import google.generativeai as genai
 
-if not api_key:
-    raise ValueError("GOOGLE_API_KEY not found in environment variables. Please set it in a .env file.")
+    load_dotenv()
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        raise ValueError("GOOGLE_API_KEY not found in environment variables. Please set it in a .env file.")
+    genai.configure(api_key=api_key)
+    return api_key
 
-# Configure the Google Generative AI client
-genai.configure(api_key=api_key)
 
-# --- Initialize Components ---
-llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0.3) # Using flash for efficiency
+# --- Initialize Components (each created on first use) ---
+def create_llm():
+    from langchain_google_genai import ChatGoogleGenerativeAI
 
-try:
-    if not os.path.exists(CSV_FILE_PATH):
-         raise FileNotFoundError(f"Error: The file '{CSV_FILE_PATH}' was not found.")
+    components.get("api_key")
+    return ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0.3) # Using flash for efficiency
 
-    df_check = pd.read_csv(CSV_FILE_PATH)
-    print(f"CSV Data loaded successfully from {CSV_FILE_PATH}. Shape: {df_check.shape}")
-    # Extract date columns dynamically for the prompt
-    date_columns = [col for col in df_check.columns if '-' in col and col[0].isdigit()] # Basic check for date format DD-MM-YY
-    start_date = date_columns[0] if date_columns else "the first forecast date"
-    end_date = date_columns[-1] if date_columns else "the last forecast date"
-    print(f"Detected forecast dates: {start_date} to {end_date}")
 
+def create_agent():
+    from langchain.agents.agent_types import AgentType
+    from langchain_experimental.agents.agent_toolkits import create_csv_agent # Use the experimental agent
 
     agent_executor = create_csv_agent(
-        llm=llm,
+        llm=components.get("llm"),
         path=CSV_FILE_PATH,
         agent_type=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
         verbose=True, # Keep True for debugging, set False for cleaner output
@@ -47,13 +48,21 @@ try:
         allow_dangerous_code=True,
     )
     print("CSV Agent created successfully.")
+    return agent_executor
+
 
-except FileNotFoundError as e:
-    print(e)
-    exit()
-except Exception as e:
-    print(f"An error occurred during agent creation: {e}")
-    exit()
+def read_date_columns():
+    """Returns the DD-MM-YY date columns from the CSV header (the data itself is only loaded by the agent)."""
+    with open(CSV_FILE_PATH, newline='', encoding='utf-8') as f:
+        columns = next(csv.reader(f))
+    return [col for col in columns if '-' in col and col[0].isdigit()] # Basic check for date format DD-MM-YY
+
+
+components = LazyComponents()
+components.register("api_key", load_api_key)
+components.register("llm", create_llm)
+components.register("agent", create_agent)
+components.register("date_columns", read_date_columns)
 
 # --- Chatbot Interaction Logic ---
 
@@ -64,14 +73,14 @@ def chat_with_weather_bot():
     print(">>> Please enter only the Village, Mandal, or District name. <<<")
     print("Type 'quit' or 'exit' to end the chat.")
 
-    # Get date range from the loaded data (used in prompt)
+    # Get date range from the CSV header (used in prompt)
     try:
-        df = pd.read_csv(CSV_FILE_PATH)
-        date_columns = [col for col in df.columns if '-' in col and col[0].isdigit()]
+        date_columns = components.get("date_columns")
         forecast_start_date = date_columns[0] if date_columns else "start date"
         forecast_end_date = date_columns[-1] if date_columns else "end date"
     except Exception as e:
         print(f"Warning: Could not dynamically determine date range from CSV: {e}")
+        date_columns = []
         forecast_start_date = "start date"
         forecast_end_date = "end date"
 
@@ -126,7 +135,7 @@ def chat_with_weather_bot():
             """
 
 
-            response = agent_executor.invoke({"input": agent_prompt})
+            response = components.get("agent").invoke({"input": agent_prompt})
 
             print("\nWeather Bot:")
             # Ensure we handle potential markdown in the output if needed
@@ -143,4 +152,11 @@ def chat_with_weather_bot():
 
 # --- Start the Chatbot ---
 if __name__ == "__main__":
-    chat_with_weather_bot()
\ No newline at end of file
+    if not os.path.exists(CSV_FILE_PATH):
+        print(f"Error: The file '{CSV_FILE_PATH}' was not found.")
+        exit()
+    date_columns = components.get("date_columns")
+    print(f"Detected forecast dates: {date_columns[0] if date_columns else 'the first forecast date'} to {date_columns[-1] if date_columns else 'the last forecast date'}")
+    if PRELOAD_IN_BACKGROUND:
+        components.preload(["api_key", "llm", "agent"], background=True)
+    chat_with_weather_bot()
@@ -0,0 +1,82 @@
+import threading
+import traceback
+
+
+class LazyComponents:
+    """Named components (LLM client, forecast data, agents, indexes) created on first use and then shared.
+
+    register() only records a factory; get() calls it the first time a component
+    is needed and memoizes the result. Creation is guarded per name, so threads
+    asking for the same component at once wait for a single build, while
+    different components can be built in parallel. A factory that raises is not
+    memoized; the next get() tries again.
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._values = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, factory, replace=False):
+        """Registers factory() for name (an existing registration is kept unless replace is set)."""
+        with self._lock:
+            if name in self._factories and not replace:
+                return
+            self._factories[name] = factory
+            self._locks.setdefault(name, threading.Lock())
+            self._values.pop(name, None)
+
+    def get(self, name, factory=None):
+        """Returns the component, creating it on first use (factory registers name if it is not known yet)."""
+        if name in self._values:
+            return self._values[name]
+        if factory is not None:
+            self.register(name, factory)
+        with self._lock:
+            if name not in self._factories:
+                raise KeyError(f"Unknown component: {name}")
+            lock = self._locks[name]
+        with lock:
+            if name not in self._values:
+                self._values[name] = self._factories[name]()
+            return self._values[name]
+
+    def is_loaded(self, name):
+        return name in self._values
+
+    def names(self):
+        with self._lock:
+            return list(self._factories)
+
+    def discard(self, prefix):
+        """Forgets every component whose name starts with prefix (e.g. the agents of a replaced run)."""
+        with self._lock:
+            for name in [name for name in self._factories if name.startswith(prefix)]:
+                del self._factories[name]
+                self._values.pop(name, None)
+                self._locks.pop(name, None)
+
+    def preload(self, names=None, background=False):
+        """Creates the named components (default: all registered) ahead of their first use.
+
+        With background, they are created on a daemon thread and the thread is
+        returned; failures are printed, and get() will try them again later.
+        """
+        names = self.names() if names is None else list(names)
+        if not background:
+            for name in names:
+                self.get(name)
+            return None
+
+        def load():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    print(f"Warning: Could not preload {name}: {e}")
+                    print(traceback.format_exc())
+
+        thread = threading.Thread(target=load, name="component-preload", daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,43 @@
+import contextvars
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+
+def fetch_all(tasks, deadline_seconds, timeouts=None, default_timeout=None):
+    """Runs every task concurrently and collects what finishes in time.
+
+    tasks maps a name (e.g. "Rainfall") to a zero-argument callable. Each task
+    gets min(its timeout, time left before the global deadline); timeouts maps
+    names to per-task limits and default_timeout applies to the rest.
+
+    Every call gets its own pool with one thread per task, so each task starts
+    immediately. Abandoned tasks from earlier calls (still running after a
+    timeout) cannot queue up new work and have it reported as timed out.
+
+    Returns {name: (status, value)} where status is "ok" (value is the result),
+    "timeout" (value is None) or "error" (value is the exception). A task that
+    times out keeps running in the background, but nobody waits for it.
+    Tasks run in a copy of the caller's context, so they record into the caller's query trace.
+    """
+    timeouts = timeouts or {}
+    start = time.monotonic()
+    executor = ThreadPoolExecutor(max_workers=max(len(tasks), 1), thread_name_prefix="fetch")
+    futures = {name: executor.submit(contextvars.copy_context().run, task) for name, task in tasks.items()}
+    executor.shutdown(wait=False)  # Threads exit when their task finishes; nobody waits for timed-out ones
+
+    results = {}
+    for name, future in futures.items():
+        task_timeout = timeouts.get(name, default_timeout)
+        remaining = deadline_seconds - (time.monotonic() - start)
+        if task_timeout is not None:
+            remaining = min(remaining, task_timeout - (time.monotonic() - start))
+        try:
+            results[name] = ("ok", future.result(timeout=max(remaining, 0)))
+        except FutureTimeoutError:
+            results[name] = ("timeout", None)
+        except Exception as e:
+            print(f"Error in {name} task: {e}")
+            print(traceback.format_exc())
+            results[name] = ("error", e)
+    return results
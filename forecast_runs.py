@@ -0,0 +1,188 @@
+import os
+import threading
+import time
+import traceback
+from components import LazyComponents
+from forecast_store import run_csv_paths
+from forecast_snapshot import load_or_ingest, load_snapshot, snapshot_path, snapshot_is_current, find_run_ids, describe_sources, data_version
+from spatial_index import SpatialIndex
+from regional_stats import RegionalStats
+
+# --- Configuration ---
+# How often the data directory is checked for a new forecast run
+RUN_POLL_SECONDS = 60
+# A run's files must be unchanged for this long before it is loaded (guards against half-copied files)
+RUN_SETTLE_SECONDS = 30
+# Parameters whose CSVs must all be present for a run to count as complete (Heat Index is optional)
+REQUIRED_PARAMETERS = ["Rainfall", "Humidity", "Wind Speed", "Temperature"]
+
+
+class ForecastRun:
+    """One loaded forecast run: its store, indexes, regional rollups and source paths.
+
+    The data never changes after creation. The spatial index and the regional
+    rollups are built on first use (or by preload()), so a run that only
+    answers name lookups never pays for them.
+    """
+
+    def __init__(self, run_id, store, location_index, csv_paths):
+        self.run_id = run_id
+        self.store = store
+        self.location_index = location_index
+        self.csv_paths = csv_paths
+        self.loaded_at = time.time()
+        self.components = LazyComponents()
+        self.components.register("spatial_index", lambda: SpatialIndex.from_store(store))  # A few milliseconds; not worth snapshotting
+        self.components.register("regional_stats", lambda: RegionalStats(store))
+
+    @property
+    def spatial_index(self):
+        return self.components.get("spatial_index")
+
+    @property
+    def regional_stats(self):
+        return self.components.get("regional_stats")
+
+    def preload(self):
+        """Builds the lazy indexes now (e.g. before a server starts taking requests)."""
+        self.components.preload()
+
+    @property
+    def start_date(self):
+        return self.store.dates[0] if self.store.dates else "start date"
+
+    @property
+    def end_date(self):
+        return self.store.dates[-1] if self.store.dates else "end date"
+
+
+class ForecastRunManager:
+    """Keeps the newest complete forecast run of a data directory loaded.
+
+    Callers take current() once per query and use that ForecastRun throughout,
+    so a query that is in flight while a new run is swapped in finishes against
+    the run it started with. New runs are loaded on a background thread and
+    replace the active run with a single reference assignment. With preload,
+    a run's lazy indexes are built before it becomes active.
+
+    With snapshot_only, the manager never parses CSVs or writes snapshots: it
+    waits until another process (e.g. the server's parent process) has
+    published a current snapshot of the run and then maps it. This stops
+    several worker processes from ingesting the same new run at once.
+    """
+
+    def __init__(self, data_dir, snapshot_dir=None, poll_seconds=RUN_POLL_SECONDS, settle_seconds=RUN_SETTLE_SECONDS, required_parameters=REQUIRED_PARAMETERS, preload=False, snapshot_only=False):
+        self.data_dir = data_dir
+        self.snapshot_dir = snapshot_dir or os.path.join(data_dir, "snapshots")
+        self.poll_seconds = poll_seconds
+        self.settle_seconds = settle_seconds
+        self.required_parameters = list(required_parameters)
+        self.preload = preload
+        self.snapshot_only = snapshot_only
+        self._active = None
+        self._listeners = []
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def current(self):
+        """Returns the active ForecastRun (None until a run has been loaded)."""
+        return self._active
+
+    def add_listener(self, callback):
+        """Registers callback(run), called after every run swap."""
+        self._listeners.append(callback)
+
+    # --- Discovery ---
+    def is_complete(self, run_id, settle=True):
+        """Checks that the required CSVs of run_id exist and (with settle) have stopped changing."""
+        csv_paths = run_csv_paths(self.data_dir, run_id)
+        if not all(os.path.exists(csv_paths[param]) for param in self.required_parameters):
+            return False
+        if settle:
+            newest_change = max(source["mtime"] for source in describe_sources(csv_paths).values())
+            if time.time() - newest_change < self.settle_seconds:
+                return False
+        return True
+
+    def newest_complete_run(self, settle=True):
+        for run_id in reversed(find_run_ids(self.data_dir)):
+            if self.is_complete(run_id, settle):
+                return run_id
+        return None
+
+    # --- Loading ---
+    def refresh(self, settle=True):
+        """Loads and activates the newest complete run if it differs from the active one.
+
+        Also reloads the active run if its files were replaced. Returns True if a swap happened.
+        """
+        with self._refresh_lock:
+            run_id = self.newest_complete_run(settle)
+            active = self._active
+            if run_id is None:
+                return False
+            csv_paths = run_csv_paths(self.data_dir, run_id)
+            if active is not None:
+                if run_id < active.run_id:
+                    return False
+                if run_id == active.run_id and data_version(describe_sources(csv_paths)) == active.store.data_version:
+                    return False
+
+            store, location_index = self._load(run_id, csv_paths)
+            if store is None:
+                return False
+            run = ForecastRun(run_id, store, location_index, csv_paths)
+            if self.preload:
+                run.preload()
+            self._active = run
+        for callback in self._listeners:
+            try:
+                callback(run)
+            except Exception as e:
+                print(f"Warning: Forecast run listener failed: {e}")
+                print(traceback.format_exc())
+        return True
+
+    def _load(self, run_id, csv_paths):
+        """Returns (store, location_index) for run_id, or (None, None) if it cannot be loaded (yet)."""
+        if not self.snapshot_only:
+            return load_or_ingest(csv_paths, self.snapshot_dir)
+        path = snapshot_path(self.snapshot_dir, run_id)
+        if not snapshot_is_current(path, csv_paths):
+            return None, None  # Not published yet; checked again on the next poll
+        try:
+            store, location_index = load_snapshot(path)
+        except Exception as e:
+            print(f"Warning: Could not load forecast snapshot {path}: {e}")
+            return None, None
+        print(f"Forecast snapshot {run_id} loaded: {len(store)} locations x {len(store.parameters)} parameters x {len(store.dates)} days.")
+        return store, location_index
+
+    def load_latest(self):
+        """Loads the newest complete run synchronously (used at startup; files are not required to have settled)."""
+        self.refresh(settle=False)
+        return self._active
+
+    # --- Background Watching ---
+    def start(self):
+        """Starts watching the data directory on a daemon thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="forecast-run-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Warning: Could not load a new forecast run: {e}")
+                print(traceback.format_exc())
@@ -0,0 +1,196 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from forecast_store import ForecastStore, METADATA_COLUMNS, load_forecast_store, parse_run_id, run_csv_paths
+from location_index import LocationIndex
+
+# --- Configuration ---
+# Bump whenever the on-disk layout changes; snapshots with another version are rebuilt
+SNAPSHOT_VERSION = 1
+
+# Files inside a snapshot directory (<snapshot_dir>/<run_id>/)
+MANIFEST_FILE = "manifest.json"  # version, run ID, parameters, dates, source CSV stats (written last)
+VALUES_FILE = "values.npy"  # float32 (location, parameter, day) block, memory-mapped on load
+METADATA_FILE = "metadata.npz"  # SP_CODE / DISTRICT / MANDAL / VILLAGE / LON / LAT
+INDEX_FILE = "index.npz"  # LocationIndex.to_arrays()
+
+
+def snapshot_path(snapshot_dir, run_id):
+    """Returns the directory holding the snapshot of run_id."""
+    return os.path.join(snapshot_dir, run_id)
+
+
+def describe_sources(csv_paths):
+    """Returns {param: {file, size, mtime}} for the CSVs that exist, used to detect stale snapshots."""
+    sources = {}
+    for param, csv_path in csv_paths.items():
+        if os.path.exists(csv_path):
+            stat = os.stat(csv_path)
+            sources[param] = {"file": os.path.basename(csv_path), "size": stat.st_size, "mtime": stat.st_mtime}
+    return sources
+
+
+def data_version(sources):
+    """Returns a short fingerprint of the source CSV stats; changes whenever a run's files are replaced."""
+    return hashlib.sha1(json.dumps(sources, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+
+# --- Writing ---
+def write_snapshot(store, location_index, snapshot_dir, run_id, csv_paths):
+    """Writes store and location_index as a versioned binary snapshot of run_id.
+
+    The snapshot is assembled in a temporary directory and moved into place, so
+    readers never see a half-written snapshot.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=f".{run_id}.", dir=snapshot_dir)
+    os.chmod(staging, 0o755)  # mkdtemp is owner-only; other worker processes need to read it
+    try:
+        np.save(os.path.join(staging, VALUES_FILE), np.ascontiguousarray(store.values, dtype=np.float32))
+        metadata = {col: store.metadata[col].to_numpy() for col in METADATA_COLUMNS}
+        for col in ("DISTRICT", "MANDAL", "VILLAGE"):
+            metadata[col] = metadata[col].astype(str)
+        np.savez(os.path.join(staging, METADATA_FILE), **metadata)
+        np.savez(os.path.join(staging, INDEX_FILE), **location_index.to_arrays())
+        manifest = {
+            "version": SNAPSHOT_VERSION,
+            "run_id": run_id,
+            "parameters": store.parameters,
+            "dates": store.dates,
+            "shape": list(store.values.shape),
+            "sources": describe_sources(csv_paths),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        with open(os.path.join(staging, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        target = snapshot_path(snapshot_dir, run_id)
+        previous = None
+        if os.path.exists(target):
+            # Processes that already mapped the old files keep reading them until they reload
+            previous = staging + ".old"
+            os.rename(target, previous)
+        os.rename(staging, target)
+        if previous:
+            shutil.rmtree(previous, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return target
+
+
+# --- Reading ---
+def read_manifest(path):
+    """Returns the manifest of the snapshot at path, or None if it is missing or unreadable."""
+    try:
+        with open(os.path.join(path, MANIFEST_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def snapshot_is_current(path, csv_paths):
+    """Checks that the snapshot at path exists, has the current version and matches the source CSVs."""
+    manifest = read_manifest(path)
+    if not manifest or manifest.get("version") != SNAPSHOT_VERSION:
+        return False
+    sources = describe_sources(csv_paths)
+    # Without the CSVs on disk the snapshot is the only copy of the run, so it is used as is
+    return not sources or manifest.get("sources") == sources
+
+
+def load_snapshot(path, mmap=True):
+    """Loads a snapshot as (ForecastStore, LocationIndex).
+
+    With mmap=True the value block is memory-mapped read-only, so several
+    processes serving the same run share its pages.
+    """
+    manifest = read_manifest(path)
+    if not manifest:
+        raise FileNotFoundError(f"No forecast snapshot found at {path}.")
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Snapshot at {path} has version {manifest.get('version')}, expected {SNAPSHOT_VERSION}.")
+
+    values = np.load(os.path.join(path, VALUES_FILE), mmap_mode="r" if mmap else None)
+    with np.load(os.path.join(path, METADATA_FILE)) as metadata_arrays:
+        metadata = pd.DataFrame({col: metadata_arrays[col] for col in METADATA_COLUMNS})
+    with np.load(os.path.join(path, INDEX_FILE)) as index_arrays:
+        location_index = LocationIndex.from_arrays({key: index_arrays[key] for key in index_arrays.files})
+    store = ForecastStore(
+        metadata, values, manifest["parameters"], manifest["dates"],
+        run_id=manifest["run_id"], data_version=data_version(manifest.get("sources", {})),
+    )
+    return store, location_index
+
+
+def load_or_ingest(csv_paths, snapshot_dir):
+    """Returns (ForecastStore, LocationIndex) for a run, preferring its snapshot.
+
+    If the snapshot is missing or stale, the CSVs are parsed and a fresh snapshot
+    is written for the next start. Returns (None, None) if no data is available.
+    """
+    run_id = next(filter(None, (parse_run_id(csv_path) for csv_path in csv_paths.values())), None)
+    if run_id:
+        path = snapshot_path(snapshot_dir, run_id)
+        if snapshot_is_current(path, csv_paths):
+            try:
+                store, location_index = load_snapshot(path)
+                print(f"Forecast snapshot {run_id} loaded: {len(store)} locations x {len(store.parameters)} parameters x {len(store.dates)} days.")
+                return store, location_index
+            except Exception as e:
+                print(f"Warning: Could not load forecast snapshot {path}: {e}. Falling back to CSV files.")
+
+    store = load_forecast_store(csv_paths)
+    if store is None:
+        return None, None
+    store.run_id = run_id
+    store.data_version = data_version(describe_sources(csv_paths))
+    location_index = LocationIndex(store.metadata)
+    if run_id:
+        try:
+            write_snapshot(store, location_index, snapshot_dir, run_id, csv_paths)
+            print(f"Forecast snapshot {run_id} written to {snapshot_dir}.")
+        except OSError as e:
+            print(f"Warning: Could not write forecast snapshot for {run_id}: {e}")
+    return store, location_index
+
+
+# --- Ingest Command ---
+def find_run_ids(data_dir):
+    """Returns the run IDs of the forecast CSVs in data_dir, oldest first."""
+    return sorted({run_id for run_id in map(parse_run_id, glob.glob(os.path.join(data_dir, "*_day*_UTC.csv"))) if run_id})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert forecast run CSVs into binary snapshots for fast bot startup.")
+    parser.add_argument("data_dir", help="Directory containing the *_dayYYYYMMDDHH_UTC.csv files")
+    parser.add_argument("--run", dest="run_ids", action="append", help="Run ID to ingest, e.g. 2025040812_UTC (default: every run found)")
+    parser.add_argument("--out", default=None, help="Snapshot directory (default: <data_dir>/snapshots)")
+    args = parser.parse_args()
+
+    snapshot_dir = args.out or os.path.join(args.data_dir, "snapshots")
+    run_ids = args.run_ids or find_run_ids(args.data_dir)
+    if not run_ids:
+        print(f"No forecast runs found in {args.data_dir}.")
+        return
+
+    for run_id in run_ids:
+        start = time.perf_counter()
+        csv_paths = run_csv_paths(args.data_dir, run_id)
+        store = load_forecast_store(csv_paths)
+        if store is None:
+            print(f"Skipping {run_id}: no CSV files found.")
+            continue
+        target = write_snapshot(store, LocationIndex(store.metadata), snapshot_dir, run_id, csv_paths)
+        print(f"Snapshot for {run_id} written to {target} in {time.perf_counter() - start:.2f}s.")
+
+
+if __name__ == "__main__":
+    main()
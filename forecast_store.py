@@ -0,0 +1,187 @@
+import os
+import re
+import numpy as np
+import pandas as pd
+
+# --- Configuration ---
+# Columns that identify a location in every forecast CSV
+LOCATION_COLUMNS = ["VILLAGE", "MANDAL", "DISTRICT"]
+
+# Per-location columns kept once in the shared metadata table
+METADATA_COLUMNS = ["SP_CODE", "DISTRICT", "MANDAL", "VILLAGE", "LON", "LAT"]
+
+# Forecast parameters and the file prefix of their CSVs (e.g. RF_day2025040812_UTC.csv)
+PARAMETER_FILE_PREFIXES = {
+    "Rainfall": "RF",
+    "Humidity": "RH",
+    "Wind Speed": "WS",
+    "Temperature": "T2",
+    "Heat Index": "HI",
+}
+
+# Forecast run ID embedded in the CSV file names, e.g. "2025040812_UTC"
+RUN_ID_PATTERN = re.compile(r"_day(\d{10}_UTC)\.csv$")
+
+# Cap on matched rows formatted per parameter (district names can match hundreds of villages)
+MAX_MATCHES_PER_QUERY = 25
+
+
+# --- Forecast Runs ---
+def parse_run_id(csv_path):
+    """Returns the forecast run ID ("YYYYMMDDHH_UTC") from a forecast CSV file name, or None."""
+    match = RUN_ID_PATTERN.search(os.path.basename(csv_path))
+    return match.group(1) if match else None
+
+
+def run_csv_paths(data_dir, run_id):
+    """Returns {param: CSV path} for every parameter of run_id in data_dir (the files may not exist)."""
+    return {param: os.path.join(data_dir, f"{prefix}_day{run_id}.csv") for param, prefix in PARAMETER_FILE_PREFIXES.items()}
+
+
+# --- Date Column Detection ---
+def detect_date_columns(columns):
+    """Returns the DD-MM-YY date columns in chronological order."""
+    date_columns = [col for col in columns if isinstance(col, str) and col.count('-') == 2 and all(part.isdigit() for part in col.split('-'))]
+    parsed = {col: pd.to_datetime(col, format='%d-%m-%y', errors='coerce') for col in date_columns}
+    date_columns = [col for col in date_columns if parsed[col] is not pd.NaT]
+    date_columns.sort(key=lambda col: parsed[col])
+    return date_columns
+
+
+# --- Forecast Store ---
+class ForecastStore:
+    """Every forecast parameter of one run, joined on SP_CODE.
+
+    metadata holds one row per location (METADATA_COLUMNS) and values is a
+    contiguous float32 array shaped (location, parameter, day), so a single row
+    offset gives every parameter at once. Missing values are NaN.
+    """
+
+    def __init__(self, metadata, values, parameters, dates, run_id=None, data_version=None):
+        self.metadata = metadata
+        self.values = values
+        self.parameters = list(parameters)
+        self.dates = list(dates)
+        # Forecast run ("2025040812_UTC") and a fingerprint of the source files it was loaded from
+        self.run_id = run_id
+        self.data_version = data_version
+        self.parameter_positions = {param: i for i, param in enumerate(self.parameters)}
+        # (village, mandal, district) per location, for formatting matches
+        self.location_names = metadata[LOCATION_COLUMNS].to_numpy()
+
+    def __len__(self):
+        return len(self.metadata)
+
+    def has_parameter(self, param):
+        return param in self.parameter_positions
+
+    def parameter_values(self, param):
+        """Returns the (location, day) values of one parameter (a view, not a copy)."""
+        return self.values[:, self.parameter_positions[param], :]
+
+
+def load_forecast_store(csv_paths):
+    """Loads the parameter CSVs into a single ForecastStore.
+
+    csv_paths maps a parameter name (e.g. "Rainfall") to its CSV path. The first
+    available file provides the location metadata and date columns; the others
+    only contribute their values. Missing files are skipped with a warning.
+    """
+    available = {}
+    for param, csv_path in csv_paths.items():
+        if os.path.exists(csv_path):
+            available[param] = csv_path
+        else:
+            print(f"Warning: CSV file not found at {csv_path}. {param} data will be unavailable.")
+    if not available:
+        return None
+
+    params = list(available)
+    base_df = pd.read_csv(available[params[0]], encoding='utf-8')
+    metadata = base_df[METADATA_COLUMNS].copy()
+    for col in LOCATION_COLUMNS:
+        metadata[col] = metadata[col].astype(str).str.strip()
+    dates = detect_date_columns(base_df.columns)
+    base_codes = metadata["SP_CODE"].to_numpy()
+    code_index = pd.Index(base_codes)
+
+    values = np.full((len(metadata), len(params), len(dates)), np.nan, dtype=np.float32)
+    for p, param in enumerate(params):
+        if p == 0:
+            df = base_df
+        else:
+            # Metadata is already known; only the join key and the values are parsed
+            df = pd.read_csv(available[param], encoding='utf-8', usecols=lambda col: col == "SP_CODE" or col in dates)
+        missing_dates = [date for date in dates if date not in df.columns]
+        if missing_dates:
+            print(f"Warning: {param} data has no values for {', '.join(missing_dates)}.")
+        param_values = df.reindex(columns=dates).to_numpy(dtype=np.float32)
+        codes = df["SP_CODE"].to_numpy()
+        if np.array_equal(codes, base_codes):
+            values[:, p, :] = param_values
+        else:
+            positions = code_index.get_indexer(codes)
+            known = positions >= 0
+            if not known.all():
+                print(f"Warning: {(~known).sum()} {param} rows have SP_CODEs not present in {params[0]} data; ignored.")
+            values[positions[known], p, :] = param_values[known]
+        print(f"{param} data loaded from {os.path.basename(available[param])}.")
+
+    print(f"Forecast store ready: {len(metadata)} locations x {len(params)} parameters x {len(dates)} days.")
+    return ForecastStore(metadata, values, params, dates)
+
+
+# --- Lookup ---
+def format_data_line(location, dates, values):
+    """Formats one location's values of one parameter as "Location: <location>. Data: date: value, ..."."""
+    data = ", ".join(f"{date}: {'n/a' if np.isnan(value) else f'{value:g}'}" for date, value in zip(dates, np.round(values, 2)))
+    return f"Location: {location}. Data: {data}"
+
+
+def format_location_data(store, rows, param, max_matches=MAX_MATCHES_PER_QUERY):
+    """Formats one parameter for the matched rows as "Location: V, M, D. Data: date: value, ..." lines."""
+    shown = rows[:max_matches]
+    names = store.location_names[shown]
+    values = store.parameter_values(param)[shown]
+    lines = []
+    for (village, mandal, district), row_values in zip(names, values):
+        lines.append(format_data_line(f"{village}, {mandal}, {district}", store.dates, row_values))
+    if len(rows) > max_matches:
+        lines.append(f"({len(rows) - max_matches} more matching locations not shown.)")
+    return "\n".join(lines)
+
+
+def format_rows(store, rows):
+    """Returns {param: data string} for the given rows, or None per parameter if rows is empty."""
+    return {param: format_location_data(store, rows, param) if len(rows) else None for param in store.parameters}
+
+
+def lookup_location(store, location_index, user_input, mode="substring"):
+    """Retrieves the formatted data string of every parameter in the store for user_input.
+
+    The rows are resolved once through the location index and reused for every parameter.
+    Returns {param: data string}, or None for a parameter with no matching rows.
+    """
+    return format_rows(store, location_index.search(user_input, mode))
+
+
+def location_records(store, rows, max_matches=MAX_MATCHES_PER_QUERY):
+    """Returns the matched rows as plain dicts (location details plus {param: {date: value}}), e.g. for JSON output."""
+    shown = np.asarray(rows[:max_matches])
+    shown_metadata = store.metadata.iloc[shown]
+    meta = {col: shown_metadata[col].tolist() for col in METADATA_COLUMNS}
+    values = np.asarray(store.values[shown], dtype=np.float64).round(2)
+    values = np.where(np.isnan(values), None, values).tolist()
+    records = []
+    for i, row_values in enumerate(values):
+        forecast = {param: dict(zip(store.dates, row_values[p])) for p, param in enumerate(store.parameters)}
+        records.append({
+            "sp_code": int(meta["SP_CODE"][i]),
+            "village": meta["VILLAGE"][i],
+            "mandal": meta["MANDAL"][i],
+            "district": meta["DISTRICT"][i],
+            "lon": float(meta["LON"][i]),
+            "lat": float(meta["LAT"][i]),
+            "forecast": forecast,
+        })
+    return records
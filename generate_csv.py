@@ -1,40 +1,248 @@
-import pandas as pd
-import random
-
-# Sample values
-locations = ['Vijayawada', 'Hyderabad', 'Chennai', 'Mumbai', 'Bangalore']
-conditions = ['Sunny', 'Cloudy', 'Rainy', 'Partly Cloudy', 'Stormy']
-
-# Generate 5 entries
-data = []
-for i in range(1, 6):
-    location = random.choice(locations)
-    temp_c = random.randint(18, 35)
-    humidity = random.randint(40, 90)
-    wind = random.randint(5, 25)
-    condition = random.choice(conditions)
-    
-    # Generate day-wise random temperatures
-    days = [f"{random.randint(18, 35)}°C" for _ in range(5)]
-
-    row = {
-        "Sno": i,
-        "Location": location,
-        "Temperature": f"{temp_c}°C",
-        "temperature_c": temp_c,
-        "humidity_percent": humidity,
-        "wind_kph": wind,
-        "condition": condition,
-        "Day-1": days[0],
-        "Day-2": days[1],
-        "Day-3": days[2],
-        "Day-4": days[3],
-        "Day-5": days[4],
-    }
-    data.append(row)
-
-# Create DataFrame and save
-df = pd.DataFrame(data)
-df.to_csv("weather_data.csv", index=False)
-
-print("✅ Weather data saved to 'formatted_weather_data.csv'")
+import argparse
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+import numpy as np
+from forecast_store import PARAMETER_FILE_PREFIXES, METADATA_COLUMNS
+
+# --- Configuration ---
+# Defaults reproduce the size of the bundled run (one state, 9 days)
+DEFAULT_LOCATIONS = 18334
+DEFAULT_DAYS = 9
+DEFAULT_RUNS = 1
+DEFAULT_FIRST_RUN = "2025040812_UTC"
+RUN_INTERVAL_HOURS = 24
+GENERATOR_SEED = 7
+# Rows generated and written per step; memory use is about 1 KB per row
+CHUNK_ROWS = 100_000
+
+# Hierarchy sizes of the bundled data (18334 villages, 669 mandals, 13 districts)
+VILLAGES_PER_MANDAL = 27
+MANDALS_PER_DISTRICT = 51
+DISTRICTS_PER_STATE = 13
+# LON/LAT extent of one state and where the first one starts (about Andhra Pradesh)
+STATE_SPAN_DEGREES = (8.0, 6.5)
+FIRST_STATE_ORIGIN = (76.8, 12.6)
+# States are tiled eastward and northward and shrunk to stay within this LON/LAT extent
+MAX_EXTENT_DEGREES = (100.0, 45.0)
+
+SYLLABLES = ["ra", "ma", "ku", "pa", "la", "ve", "di", "na", "ko", "ta", "gu", "va", "se", "ri", "ya", "ja", "bo", "chi", "ka", "lu", "ne", "ti", "su", "ga"]
+VILLAGE_SUFFIXES = ["palle", "puram", "peta", "gudem", "padu", "varam", "uru", "kota", "palem", "cheruvu", "pudi", "dinne"]
+
+# Smooth weather fields are sums of plane waves with wavelengths in this range (degrees)
+FIELD_WAVES = 4
+FIELD_WAVELENGTH_DEGREES = (1.5, 8.0)
+# Share of a field that differs between runs for the same date, at the longest lead time
+RUN_SPREAD = 0.35
+
+
+def log(message):
+    print(message, file=sys.stderr)
+
+
+def format_run_id(run_time):
+    return f"{run_time:%Y%m%d%H}_UTC"
+
+
+# --- Geography ---
+def coded_names(count, salt):
+    """count distinct upper-case names made of syllables (in a scrambled order, so neighbours differ)."""
+    length = max(3, math.ceil(math.log(max(count, 2), len(SYLLABLES))))
+    capacity = len(SYLLABLES) ** length
+    step = 7919 if math.gcd(7919, capacity) == 1 else 7907
+    names = []
+    for i in range(count):
+        code = (i * step + salt) % capacity
+        parts = []
+        for _ in range(length):
+            code, digit = divmod(code, len(SYLLABLES))
+            parts.append(SYLLABLES[digit])
+        names.append("".join(parts).upper())
+    return names
+
+
+class Geography:
+    """Districts, mandals and villages of the generated states.
+
+    Location i is village i % VILLAGES_PER_MANDAL of mandal i // VILLAGES_PER_MANDAL;
+    mandal m belongs to district m // MANDALS_PER_DISTRICT. Only the district
+    and mandal tables are kept; villages are generated chunk by chunk.
+    """
+
+    def __init__(self, locations, seed=GENERATOR_SEED):
+        self.locations = locations
+        self.seed = seed
+        n_mandals = math.ceil(locations / VILLAGES_PER_MANDAL)
+        n_districts = math.ceil(n_mandals / MANDALS_PER_DISTRICT)
+        n_states = math.ceil(n_districts / DISTRICTS_PER_STATE)
+        columns = math.ceil(math.sqrt(n_states))
+        rows = math.ceil(n_states / columns)
+        self.scale = min(1.0, MAX_EXTENT_DEGREES[0] / (columns * STATE_SPAN_DEGREES[0]), MAX_EXTENT_DEGREES[1] / (rows * STATE_SPAN_DEGREES[1]))
+        span = np.array(STATE_SPAN_DEGREES) * self.scale
+
+        rng = np.random.default_rng([seed, 0])
+        states = np.arange(n_districts) // DISTRICTS_PER_STATE
+        origins = np.array(FIRST_STATE_ORIGIN) + np.column_stack([states % columns, states // columns]) * span
+        district_centers = origins + rng.uniform(0.1, 0.9, size=(n_districts, 2)) * span
+        mandal_districts = np.arange(n_mandals) // MANDALS_PER_DISTRICT
+        self.mandal_centers = district_centers[mandal_districts] + rng.normal(0, 0.08, size=(n_mandals, 2)) * span
+        self.mandal_districts = mandal_districts
+        self.district_names = np.array(coded_names(n_districts, salt=11))
+        self.mandal_names = np.array(coded_names(n_mandals, salt=101))
+
+    def chunk(self, start, stop):
+        """Returns (prefixes, lons, lats) for locations start..stop in a shuffled row order.
+
+        prefixes are the CSV cells before the day columns ("Sno,SP_CODE,...,LAT,")
+        as ASCII bytes; they are the same in every parameter file of every run.
+        """
+        rng = np.random.default_rng([self.seed, 1, start])
+        locations = start + rng.permutation(stop - start)
+        mandals = locations // VILLAGES_PER_MANDAL
+        districts = self.mandal_districts[mandals]
+        codes = (districts + 1) * 100000 + (mandals % MANDALS_PER_DISTRICT + 1) * 1000 + locations % VILLAGES_PER_MANDAL + 1
+        lonlat = self.mandal_centers[mandals] + rng.normal(0, 0.05 * self.scale, size=(len(locations), 2))
+        syllables = rng.integers(len(SYLLABLES), size=(len(locations), 2))
+        suffixes = rng.integers(len(VILLAGE_SUFFIXES), size=len(locations))
+        prefixes = [
+            f'{start + i + 1},{code},"{district}","{mandal}","{SYLLABLES[a].capitalize()}{SYLLABLES[b]}{VILLAGE_SUFFIXES[s]}",{lon:.6f},{lat:.6f},'
+            for i, (code, district, mandal, (a, b), s, (lon, lat)) in enumerate(zip(
+                codes.tolist(), self.district_names[districts].tolist(), self.mandal_names[mandals].tolist(),
+                syllables.tolist(), suffixes.tolist(), lonlat.tolist()))
+        ]
+        return np.array(prefixes, dtype="S"), lonlat[:, 0], lonlat[:, 1]
+
+
+# --- Weather Fields ---
+def wave_field(lons, lats, keys, seed, salt):
+    """Smooth field of about unit variance: one column per key (a date), the same at the same place and key."""
+    lo, hi = (2 * math.pi / wavelength for wavelength in reversed(FIELD_WAVELENGTH_DEGREES))
+    waves = []
+    for key in keys:
+        rng = np.random.default_rng([seed, salt, key])
+        wavenumbers = rng.uniform(lo, hi, FIELD_WAVES) * np.exp(1j * rng.uniform(0, 2 * math.pi, FIELD_WAVES))
+        waves.append((wavenumbers.real, wavenumbers.imag, rng.uniform(0, 2 * math.pi, FIELD_WAVES)))
+    kx, ky, phases = (np.concatenate(part).astype(np.float32) for part in zip(*waves))
+    # float32 sines are about 3x faster and precise enough for 2-decimal output
+    angles = np.outer(lons.astype(np.float32), kx) + np.outer(lats.astype(np.float32), ky) + phases
+    return np.sin(angles).reshape(len(lons), len(keys), FIELD_WAVES).sum(axis=2) * math.sqrt(2 / FIELD_WAVES)
+
+
+def forecast_values(lons, lats, dates, run_index, seed, chunk_start):
+    """Returns {file prefix: (n, days) values} for one chunk of locations in one run.
+
+    Each parameter is a smooth field per date plus local noise. A date gets the
+    same base field in every run, with a run-specific part that grows with the
+    lead time, so overlapping runs roughly agree. Humidity falls as temperature
+    rises, and the heat index follows both.
+    """
+    keys = [date.toordinal() for date in dates]
+    lead = RUN_SPREAD * np.arange(1, len(dates) + 1) / len(dates)
+    rng = np.random.default_rng([seed, 2, run_index, chunk_start])
+
+    def field(salt):
+        return (1 - lead) * wave_field(lons, lats, keys, seed, salt) + lead * wave_field(lons, lats, keys, seed, salt + 1000 * (run_index + 1))
+
+    def noise(scale):
+        return rng.normal(0, scale, size=(len(lons), len(dates)))
+
+    temperature = np.clip(36 + 2.5 * field(1) + noise(0.6), 15, 48)
+    humidity = np.clip(61 + 11 * field(2) - 1.0 * (temperature - 36) + noise(3), 15, 100)
+    wind = np.clip(13.8 * np.exp(0.35 * field(3) + noise(0.15)), 0, 80)
+    wetness = field(4) + noise(0.4)
+    rain = np.where(wetness > 0.4, rng.exponential(1.0, size=wetness.shape) * (wetness - 0.4) * 4, np.where(wetness > 0, wetness * 0.3, 0)).clip(0, 500)
+    heat_index = np.clip(temperature + 0.12 * (humidity - 35) + noise(0.4), 15, 60)
+    return {"RF": rain, "RH": humidity, "WS": wind, "T2": temperature, "HI": heat_index}
+
+
+# --- CSV Writing ---
+def csv_rows(prefixes, values):
+    """Formats rows as CSV bytes: each prefix followed by its values with 2 decimals.
+
+    Works on byte matrices instead of Python strings (about 10x faster than
+    DataFrame.to_csv). values must lie in [0, 1000).
+    """
+    n, days = values.shape
+    cents = np.rint(values * 100).astype(np.int64)
+    cells = np.empty((n, days, 7), dtype=np.uint8)
+    for k, divisor in enumerate([10000, 1000, 100]):
+        cells[:, :, k] = 48 + (cents // divisor) % 10
+    cells[:, :, 3] = ord(".")
+    cells[:, :, 4] = 48 + (cents // 10) % 10
+    cells[:, :, 5] = 48 + cents % 10
+    cells[:, :, 6] = ord(",")
+    cells[:, -1, 6] = ord("\n")
+    keep = np.ones(cells.shape, dtype=bool)
+    keep[:, :, 0] = cents >= 10000  # No leading zeros
+    keep[:, :, 1] = cents >= 1000
+    prefix_bytes = prefixes.view(np.uint8).reshape(n, -1)
+    return np.hstack([prefix_bytes, cells.reshape(n, -1)])[np.hstack([prefix_bytes != 0, keep.reshape(n, -1)])].tobytes()
+
+
+def generate_run(out_dir, run_id, run_index, locations, days, seed=GENERATOR_SEED, chunk_rows=CHUNK_ROWS):
+    """Writes the five parameter CSVs of one run, chunk by chunk. Returns the bytes written.
+
+    Files are written as *.part and renamed when complete, so a watcher never
+    sees a half-written run.
+    """
+    geography = Geography(locations, seed)
+    run_time = datetime.strptime(run_id, "%Y%m%d%H_UTC")
+    dates = [(run_time + timedelta(days=day)).date() for day in range(1, days + 1)]
+    header = ",".join(f'"{col}"' for col in ["Sno"] + METADATA_COLUMNS + [f"{date:%d-%m-%y}" for date in dates]) + "\n"
+    paths = {prefix: os.path.join(out_dir, f"{prefix}_day{run_id}.csv") for prefix in PARAMETER_FILE_PREFIXES.values()}
+    files = {prefix: open(path + ".part", "wb") for prefix, path in paths.items()}
+    try:
+        for f in files.values():
+            f.write(header.encode("ascii"))
+        for start in range(0, locations, chunk_rows):
+            prefixes, lons, lats = geography.chunk(start, min(start + chunk_rows, locations))
+            for prefix, values in forecast_values(lons, lats, dates, run_index, seed, start).items():
+                files[prefix].write(csv_rows(prefixes, values))
+    finally:
+        for f in files.values():
+            f.close()
+    for prefix, path in paths.items():
+        os.replace(path + ".part", path)
+    return sum(os.path.getsize(path) for path in paths.values())
+
+
+def generate_runs(out_dir, locations=DEFAULT_LOCATIONS, days=DEFAULT_DAYS, runs=DEFAULT_RUNS, first_run=DEFAULT_FIRST_RUN,
+                  interval_hours=RUN_INTERVAL_HOURS, seed=GENERATOR_SEED, workers=1, chunk_rows=CHUNK_ROWS):
+    """Generates runs consecutive forecast runs, interval_hours apart, into out_dir (one process per run with workers > 1)."""
+    os.makedirs(out_dir, exist_ok=True)
+    first_time = datetime.strptime(first_run, "%Y%m%d%H_UTC")
+    run_ids = [format_run_id(first_time + timedelta(hours=interval_hours * i)) for i in range(runs)]
+    start = time.perf_counter()
+    jobs = [(out_dir, run_id, i, locations, days, seed, chunk_rows) for i, run_id in enumerate(run_ids)]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            sizes = list(pool.map(generate_run, *zip(*jobs)))
+    else:
+        sizes = []
+        for job in jobs:
+            sizes.append(generate_run(*job))
+            log(f"Run {job[1]} written ({sizes[-1] / 1e6:.0f} MB).")
+    elapsed = time.perf_counter() - start
+    log(f"{runs} run(s) x {locations} locations x {days} days written to {out_dir}: {sum(sizes) / 1e9:.2f} GB in {elapsed:.1f}s.")
+    return run_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generates synthetic forecast runs in the *_day<run>_UTC.csv layout of the real data.")
+    parser.add_argument("out_dir", help="Directory to write the CSVs to (e.g. the bot's DATA_DIR)")
+    parser.add_argument("--locations", type=int, default=DEFAULT_LOCATIONS, help="Villages per run (states are added as needed)")
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS, help="Forecast horizon in days")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS, help="Number of consecutive runs")
+    parser.add_argument("--first-run", default=DEFAULT_FIRST_RUN, help="Run ID of the first run (YYYYMMDDHH_UTC)")
+    parser.add_argument("--interval-hours", type=int, default=RUN_INTERVAL_HOURS, help="Hours between runs")
+    parser.add_argument("--seed", type=int, default=GENERATOR_SEED)
+    parser.add_argument("--workers", type=int, default=1, help="Runs generated in parallel processes")
+    args = parser.parse_args()
+    generate_runs(args.out_dir, args.locations, args.days, args.runs, args.first_run, args.interval_hours, args.seed, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+import contextvars
+import json
+import math
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+# --- Configuration ---
+# Most recent durations kept per stage for the rolling percentiles
+ROLLING_WINDOW = 1000
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+def current_trace():
+    """Returns the QueryTrace of the running turn, or None outside a traced turn."""
+    return _current_trace.get()
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = min(max(math.ceil(fraction * len(sorted_values)) - 1, 0), len(sorted_values) - 1)
+    return sorted_values[rank]
+
+
+@contextmanager
+def stage(name, **attributes):
+    """Times the enclosed block as a stage of the current trace (does nothing outside a traced turn)."""
+    trace = current_trace()
+    if trace is None:
+        yield None
+        return
+    with trace.stage(name, **attributes) as record:
+        yield record
+
+
+class QueryTrace:
+    """Timings, LLM calls and cache lookups of one turn, exported as one JSON object.
+
+    Stages may be recorded from several threads (e.g. the parameter agents of
+    one fan-out); every record is appended under a lock.
+    """
+
+    def __init__(self, query, **attributes):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.query = query
+        self.attributes = dict(attributes)
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.duration_ms = None
+        self.status = "ok"
+        self.stages = []
+        self.llm_calls = []
+        self.cache = []
+        self._lock = threading.Lock()
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self._start) * 1000
+
+    @contextmanager
+    def stage(self, name, **attributes):
+        """Times the enclosed block as a stage; an exception marks the stage as failed and is re-raised."""
+        start = self.elapsed_ms()
+        record = {"name": name, "start_ms": round(start, 3), "status": "ok", **attributes}
+        try:
+            yield record
+        except BaseException as e:
+            record["status"] = "error"
+            record["error"] = repr(e)
+            raise
+        finally:
+            record["duration_ms"] = round(self.elapsed_ms() - start, 3)
+            with self._lock:
+                self.stages.append(record)
+
+    def record_llm_call(self, duration_ms, prompt_tokens=None, completion_tokens=None, status="ok"):
+        with self._lock:
+            self.llm_calls.append({
+                "start_ms": round(self.elapsed_ms() - duration_ms, 3),
+                "duration_ms": round(duration_ms, 3),
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "status": status,
+            })
+
+    def record_cache(self, kind, result):
+        """result is "memory", "disk" or "miss"."""
+        with self._lock:
+            self.cache.append({"kind": kind, "result": result, "at_ms": round(self.elapsed_ms(), 3)})
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self):
+        with self._lock:
+            llm_calls = list(self.llm_calls)
+            record = {
+                "trace_id": self.trace_id,
+                "query": self.query,
+                "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+                "duration_ms": self.duration_ms,
+                "status": self.status,
+                **self.attributes,
+                "stages": sorted(self.stages, key=lambda stage: stage["start_ms"]),
+                "cache": list(self.cache),
+            }
+        record["llm"] = {
+            "calls": len(llm_calls),
+            "prompt_tokens": sum(call["prompt_tokens"] or 0 for call in llm_calls),
+            "completion_tokens": sum(call["completion_tokens"] or 0 for call in llm_calls),
+            "duration_ms": round(sum(call["duration_ms"] for call in llm_calls), 3),
+            "details": llm_calls,
+        }
+        return record
+
+
+class Tracer:
+    """Starts and finishes QueryTraces, appends them to a JSONL file and keeps rolling percentiles.
+
+    The rolling windows hold the last ROLLING_WINDOW durations of every stage
+    name, of every LLM call ("llm_call") and of whole turns ("turn").
+    """
+
+    def __init__(self, path=None, window=ROLLING_WINDOW):
+        self.path = path
+        self._durations = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8") if path else None
+
+    @contextmanager
+    def trace(self, query, **attributes):
+        """Traces one turn: the QueryTrace is current for the enclosed block (and tasks started with fetch_all)."""
+        trace = QueryTrace(query, **attributes)
+        token = _current_trace.set(trace)
+        try:
+            yield trace
+        except BaseException:
+            trace.status = "error"
+            raise
+        finally:
+            _current_trace.reset(token)
+            self.finish(trace)
+
+    def begin(self, query, **attributes):
+        """Starts a trace and makes it current for the rest of the calling task.
+
+        For async generators, where a with block cannot span the yields; call finish() when done.
+        """
+        trace = QueryTrace(query, **attributes)
+        _current_trace.set(trace)
+        return trace
+
+    def finish(self, trace):
+        trace.duration_ms = round(trace.elapsed_ms(), 3)
+        record = trace.to_dict()
+        with self._lock:
+            self._durations["turn"].append(trace.duration_ms)
+            for stage in record["stages"]:
+                self._durations[stage["name"]].append(stage["duration_ms"])
+            for call in record["llm"]["details"]:
+                self._durations["llm_call"].append(call["duration_ms"])
+            if self._file is not None:
+                self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self._file.flush()
+        return record
+
+    def percentiles(self):
+        """Returns {name: {"count", "p50_ms", "p95_ms", "max_ms"}} over the rolling windows."""
+        with self._lock:
+            windows = {name: sorted(values) for name, values in self._durations.items()}
+        return {
+            name: {"count": len(values), "p50_ms": percentile(values, 0.5), "p95_ms": percentile(values, 0.95), "max_ms": values[-1] if values else None}
+            for name, values in windows.items()
+        }
+
+    def summary(self):
+        """Formats the rolling percentiles as one line per name, slowest p95 first."""
+        rows = sorted(self.percentiles().items(), key=lambda item: -(item[1]["p95_ms"] or 0))
+        return "\n".join(
+            f"  {name:<24} n={stats['count']:<5} p50={stats['p50_ms']:.1f}ms  p95={stats['p95_ms']:.1f}ms  max={stats['max_ms']:.1f}ms"
+            for name, stats in rows
+        )
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+# --- LLM Calls ---
+def token_usage(response):
+    """Returns (prompt_tokens, completion_tokens) from a LangChain LLMResult or message, or (None, None)."""
+    messages = []
+    for generations in getattr(response, "generations", None) or []:
+        messages.extend(getattr(generation, "message", None) for generation in generations)
+    if not messages:
+        messages = [response]
+    prompt_tokens = completion_tokens = None
+    for message in messages:
+        usage = getattr(message, "usage_metadata", None)
+        if usage:
+            prompt_tokens = (prompt_tokens or 0) + usage.get("input_tokens", 0)
+            completion_tokens = (completion_tokens or 0) + usage.get("output_tokens", 0)
+    if prompt_tokens is None:
+        usage = (getattr(response, "llm_output", None) or {}).get("token_usage") or {}
+        if usage:
+            prompt_tokens = usage.get("prompt_tokens")
+            completion_tokens = usage.get("completion_tokens")
+    return prompt_tokens, completion_tokens
+
+
+_handler_class = None
+
+
+def trace_callback_handler():
+    """Returns a LangChain callback handler that records every LLM call in the current trace.
+
+    Attached to the chat model when it is created, it also sees the calls made
+    inside the CSV agents, so each agent round trip is counted.
+    """
+    global _handler_class
+    if _handler_class is None:
+        from langchain_core.callbacks import BaseCallbackHandler
+
+        class TraceCallbackHandler(BaseCallbackHandler):
+            def __init__(self):
+                self._calls = {}  # run_id -> (trace, start)
+
+            def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+                self._start(run_id)
+
+            def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+                self._start(run_id)
+
+            def on_llm_end(self, response, *, run_id, **kwargs):
+                self._end(run_id, response, "ok")
+
+            def on_llm_error(self, error, *, run_id, **kwargs):
+                self._end(run_id, None, "error")
+
+            def _start(self, run_id):
+                trace = current_trace()
+                if trace is not None:
+                    self._calls[run_id] = (trace, time.perf_counter())
+
+            def _end(self, run_id, response, status):
+                trace, start = self._calls.pop(run_id, (None, None))
+                if trace is not None:
+                    prompt_tokens, completion_tokens = token_usage(response) if response is not None else (None, None)
+                    trace.record_llm_call((time.perf_counter() - start) * 1000, prompt_tokens, completion_tokens, status)
+
+        _handler_class = TraceCallbackHandler
+    return _handler_class()
+
+
+def check_percentiles():
+    """Checks percentile() against hand-computed nearest ranks (run: python instrumentation.py)."""
+    cases = [(10, 0.5, 5), (10, 0.95, 10), (20, 0.5, 10), (20, 0.95, 19), (100, 0.5, 50), (100, 0.95, 95), (2, 0.5, 1), (1, 0.95, 1)]
+    for n, fraction, expected in cases:
+        got = percentile(list(range(1, n + 1)), fraction)
+        assert got == expected, f"p{fraction * 100:g} of {n} samples: expected rank {expected}, got {got}"
+    print(f"percentile: {len(cases)} cases OK.")
+
+
+if __name__ == "__main__":
+    check_percentiles()
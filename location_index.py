@@ -0,0 +1,240 @@
+from functools import lru_cache
+import numpy as np
+
+# --- Configuration ---
+# Location levels indexed, in the order they are reported
+INDEX_LEVELS = ["VILLAGE", "MANDAL", "DISTRICT"]
+
+# Length of the n-grams used for substring search and fuzzy matching
+NGRAM_SIZE = 3
+
+# --- Fuzzy Matching ---
+# Minimum unpadded trigram similarity for a name to be screened as a candidate
+FUZZY_SCREEN_CUTOFF = 0.4
+# Number of screened names re-ranked with word-boundary (padded) trigrams
+FUZZY_SCREEN_LIMIT = 50
+# Minimum padded trigram (Dice) similarity for a name to count as a fuzzy candidate
+FUZZY_CUTOFF = 0.6
+# Number of ranked candidates returned per query
+FUZZY_CANDIDATE_LIMIT = 5
+# Number of resolved query strings kept in the fuzzy match cache
+FUZZY_CACHE_SIZE = 1024
+
+
+def normalize_name(name):
+    """Normalizes a location name or query for matching (trimmed, case-folded)."""
+    return str(name).strip().casefold()
+
+
+def name_ngrams(name, size=NGRAM_SIZE):
+    """Returns the set of character n-grams of an already normalized name."""
+    return {name[i:i + size] for i in range(len(name) - size + 1)}
+
+
+def padded_ngrams(name, size=NGRAM_SIZE):
+    """Returns the n-grams of a normalized name padded with spaces, so the start and end of the word count."""
+    return name_ngrams(" " * (size - 1) + name + " ", size)
+
+
+def dice_similarity(grams_a, grams_b):
+    """Returns the Dice coefficient of two n-gram sets."""
+    if not grams_a or not grams_b:
+        return 0.0
+    return 2.0 * len(grams_a & grams_b) / (len(grams_a) + len(grams_b))
+
+
+class LocationIndex:
+    """Precomputed lookup structure over the VILLAGE, MANDAL and DISTRICT names.
+
+    Built once from a forecast frame; every lookup returns row offsets into that
+    frame (and the matching SP_CODEs), so the cost of a query depends on the
+    number of matches rather than the number of rows.
+    """
+
+    def __init__(self, df):
+        self.sp_codes = df["SP_CODE"].to_numpy()
+        self.row_count = len(df)
+
+        # Vocabulary entries: one per unique (level, normalized name)
+        self.entry_names = []
+        self.entry_display_names = []
+        self.entry_levels = []
+        self.entry_rows = []
+        # level -> (sorted names array, entry ids in the same order) for prefix search
+        self.sorted_names = {}
+
+        for level in INDEX_LEVELS:
+            raw_names = df[level].to_numpy()
+            normalized = np.array([normalize_name(name) for name in raw_names], dtype=object)
+            names, inverse = np.unique(normalized, return_inverse=True)
+            order = np.argsort(inverse, kind="stable")
+            boundaries = np.cumsum(np.bincount(inverse, minlength=len(names)))[:-1]
+            first_entry = len(self.entry_names)
+            for name, rows in zip(names, np.split(order, boundaries)):
+                self.entry_names.append(name)
+                self.entry_display_names.append(str(raw_names[rows[0]]).strip())
+                self.entry_levels.append(level)
+                self.entry_rows.append(rows.astype(np.int32))
+            self.sorted_names[level] = (names.astype(str), np.arange(first_entry, first_entry + len(names)))
+
+        # n-gram -> entry ids containing it, for substring search
+        postings = {}
+        gram_counts = np.zeros(len(self.entry_names), dtype=np.int32)
+        for entry_id, name in enumerate(self.entry_names):
+            grams = name_ngrams(name)
+            gram_counts[entry_id] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(entry_id)
+        self.ngram_postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+        self.entry_gram_counts = gram_counts
+
+        # Per-index cache of resolved (normalized) fuzzy queries
+        self._cached_fuzzy_candidates = lru_cache(maxsize=FUZZY_CACHE_SIZE)(self._fuzzy_candidates)
+
+    # --- Serialization (used by forecast snapshots) ---
+    def to_arrays(self):
+        """Returns the index as a dict of flat NumPy arrays, suitable for np.savez."""
+        entry_row_counts = np.array([len(rows) for rows in self.entry_rows], dtype=np.int64)
+        grams = sorted(self.ngram_postings)
+        gram_counts = np.array([len(self.ngram_postings[gram]) for gram in grams], dtype=np.int64)
+        return {
+            "sp_codes": self.sp_codes,
+            "entry_names": np.array(self.entry_names, dtype=str),
+            "entry_display_names": np.array(self.entry_display_names, dtype=str),
+            "entry_levels": np.array(self.entry_levels, dtype=str),
+            "entry_gram_counts": self.entry_gram_counts,
+            "entry_row_indptr": np.concatenate([[0], np.cumsum(entry_row_counts)]),
+            "entry_row_indices": np.concatenate(self.entry_rows) if self.entry_rows else np.empty(0, dtype=np.int32),
+            "gram_keys": np.array(grams, dtype=str),
+            "gram_indptr": np.concatenate([[0], np.cumsum(gram_counts)]),
+            "gram_indices": np.concatenate([self.ngram_postings[gram] for gram in grams]) if grams else np.empty(0, dtype=np.int32),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Rebuilds an index from the output of to_arrays without re-tokenizing any names."""
+        index = cls.__new__(cls)
+        index.sp_codes = arrays["sp_codes"]
+        index.row_count = len(index.sp_codes)
+        index.entry_names = arrays["entry_names"].tolist()
+        index.entry_display_names = arrays["entry_display_names"].tolist()
+        index.entry_levels = arrays["entry_levels"].tolist()
+        index.entry_gram_counts = arrays["entry_gram_counts"]
+
+        indptr, indices = arrays["entry_row_indptr"], arrays["entry_row_indices"]
+        index.entry_rows = [indices[start:end] for start, end in zip(indptr[:-1], indptr[1:])]
+
+        # Entries are stored level by level, each level's names already sorted
+        entry_names = arrays["entry_names"]
+        entry_levels = arrays["entry_levels"]
+        index.sorted_names = {}
+        for level in INDEX_LEVELS:
+            entry_ids = np.flatnonzero(entry_levels == level)
+            index.sorted_names[level] = (entry_names[entry_ids], entry_ids)
+
+        indptr, indices = arrays["gram_indptr"], arrays["gram_indices"]
+        index.ngram_postings = {
+            gram: indices[start:end] for gram, start, end in zip(arrays["gram_keys"].tolist(), indptr[:-1], indptr[1:])
+        }
+        index._cached_fuzzy_candidates = lru_cache(maxsize=FUZZY_CACHE_SIZE)(index._fuzzy_candidates)
+        return index
+
+    # --- Entry Search ---
+    def _exact_entries(self, query):
+        entries = []
+        for names, entry_ids in self.sorted_names.values():
+            pos = np.searchsorted(names, query)
+            if pos < len(names) and names[pos] == query:
+                entries.append(entry_ids[pos])
+        return entries
+
+    def _prefix_entries(self, query):
+        entries = []
+        for names, entry_ids in self.sorted_names.values():
+            start = np.searchsorted(names, query, side="left")
+            end = np.searchsorted(names, query + "\U0010ffff", side="left")
+            entries.extend(entry_ids[start:end])
+        return entries
+
+    def _substring_entries(self, query):
+        if len(query) < NGRAM_SIZE:
+            # Too short for the n-gram index; the vocabulary is far smaller than the row count
+            return [entry_id for entry_id, name in enumerate(self.entry_names) if query in name]
+        grams = sorted((self.ngram_postings.get(gram) for gram in name_ngrams(query)), key=lambda ids: -1 if ids is None else len(ids))
+        if grams[0] is None:
+            return []
+        candidates = grams[0]
+        for ids in grams[1:]:
+            candidates = np.intersect1d(candidates, ids, assume_unique=True)
+            if not len(candidates):
+                return []
+        # n-gram overlap is necessary but not sufficient; confirm the substring itself
+        return [entry_id for entry_id in candidates if query in self.entry_names[entry_id]]
+
+    # --- Public Lookup ---
+    def search(self, query, mode="substring"):
+        """Returns the sorted row offsets whose VILLAGE, MANDAL or DISTRICT matches query.
+
+        mode is "substring" (default, same semantics as str.contains), "prefix" or "exact".
+        """
+        query = normalize_name(query)
+        if not query:
+            return np.empty(0, dtype=np.int32)
+        if mode == "exact":
+            entries = self._exact_entries(query)
+        elif mode == "prefix":
+            entries = self._prefix_entries(query)
+        elif mode == "substring":
+            entries = self._substring_entries(query)
+        else:
+            raise ValueError(f"Unknown search mode: {mode}")
+        if not entries:
+            return np.empty(0, dtype=np.int32)
+        if len(entries) == 1:
+            return self.entry_rows[entries[0]]
+        return np.unique(np.concatenate([self.entry_rows[entry_id] for entry_id in entries]))
+
+    def search_sp_codes(self, query, mode="substring"):
+        """Returns (row offsets, SP_CODEs) for query."""
+        rows = self.search(query, mode)
+        return rows, self.sp_codes[rows]
+
+    # --- Fuzzy Resolution ---
+    def _fuzzy_candidates(self, query, limit):
+        grams = name_ngrams(query)
+        known = [self.ngram_postings[gram] for gram in grams if gram in self.ngram_postings]
+        if not known:
+            return ()
+        # Screen the vocabulary with the trigram postings: Dice coefficient of the unpadded trigram sets
+        overlap = np.bincount(np.concatenate(known), minlength=len(self.entry_names))
+        scores = 2.0 * overlap / (len(grams) + self.entry_gram_counts)
+        screened = np.flatnonzero(scores >= FUZZY_SCREEN_CUTOFF)
+        screened = screened[np.argsort(-scores[screened], kind="stable")][:FUZZY_SCREEN_LIMIT]
+
+        # Re-rank the survivors with padded trigrams so the first and last letters carry weight
+        query_grams = padded_ngrams(query)
+        ranked = []
+        for entry_id in screened:
+            score = dice_similarity(query_grams, padded_ngrams(self.entry_names[entry_id]))
+            if score >= FUZZY_CUTOFF:
+                ranked.append((-score, entry_id))
+        ranked.sort()
+        return tuple(
+            (self.entry_display_names[entry_id], self.entry_levels[entry_id], round(-neg_score, 3))
+            for neg_score, entry_id in ranked[:limit]
+        )
+
+    def fuzzy_candidates(self, query, limit=FUZZY_CANDIDATE_LIMIT):
+        """Returns up to limit (display name, level, score) tuples for names similar to query, best first.
+
+        Scores are padded trigram Dice similarities in [0, 1]; names below FUZZY_CUTOFF are dropped.
+        Results are cached per normalized query string.
+        """
+        query = normalize_name(query)
+        if len(query) < NGRAM_SIZE:
+            return ()
+        return self._cached_fuzzy_candidates(query, limit)
+
+    def fuzzy_cache_info(self):
+        """Returns the hit/miss statistics of the fuzzy match cache."""
+        return self._cached_fuzzy_candidates.cache_info()
@@ -1,41 +1,103 @@
+import json
 import os
-import pandas as pd
-from dotenv import load_dotenv
-import google.generativeai as genai
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.agents.agent_types import AgentType
-from langchain_experimental.agents.agent_toolkits import create_csv_agent
 import traceback # For detailed error logging
+from components import LazyComponents
+from forecast_runs import ForecastRunManager
+from concurrent_fetch import fetch_all
+from weather_report import create_llm, resolve_location, canonical_location, collect_forecast_data, synthesize_report, REPORT_PARAMETERS
+from weather_report import resolve_coordinates, describe_point, collect_point_data, synthesize_regional_answer
+from spatial_index import parse_spatial_query
+from regional_stats import parse_regional_query, answer_regional_query
+from response_cache import ResponseCache
+from instrumentation import Tracer, current_trace, stage
 
 # --- Configuration ---
-# !! UPDATE THESE PATHS to your actual CSV file locations !!
-# Use the full paths as you did in your working example
-RAINFALL_CSV_PATH = "/Users/sravva/Documents/Test/aware/RF_day2025040812_UTC.csv" # Example Rainfall Path
-HUMIDITY_CSV_PATH = "/Users/sravva/Documents/Test/aware/RH_day2025040812_UTC.csv" # Example Humidity Path - UPDATE
-WINDSPEED_CSV_PATH = "/Users/sravva/Documents/Test/aware/WS_day2025040812_UTC.csv" # Example Wind Speed Path - UPDATE
-TEMPERATURE_CSV_PATH = "/Users/sravva/Documents/Test/aware/T2_day2025040812_UTC.csv" # Example Temperature Path - UPDATE
+# !! UPDATE THIS PATH to the directory your forecast CSVs are published to !!
+# Each run is a set of <PREFIX>_dayYYYYMMDDHH_UTC.csv files (RF, RH, WS, T2, HI); the newest complete run is used.
+DATA_DIR = "/Users/sravva/Documents/Test/aware"
+
+# Binary snapshots of the forecast runs (memory-mapped at startup instead of parsing the CSVs)
+SNAPSHOT_DIR = os.path.join(DATA_DIR, "snapshots")
+
+# --- Hot Reload ---
+# Watch DATA_DIR and switch to a newer run as soon as all its files have arrived, without a restart.
+# Queries already in progress finish against the run they started with.
+HOT_RELOAD = True
+RUN_POLL_SECONDS = 60
+
+# --- Data Retrieval Mode ---
+# "native": look locations up directly in the loaded CSV data (no LLM calls; the LLM only writes the final report)
+# "agent":  use one LangChain CSV agent per parameter (several LLM round trips per parameter, slower and non-deterministic)
+RETRIEVAL_MODE = "native"
+
+# --- Report Synthesis Mode ---
+# "llm":      Gemini writes the report
+# "template": the report is rendered locally from the data (instant, reproducible, no API cost)
+# "auto":     Gemini, falling back to the template report if the LLM fails or is too slow
+SYNTHESIS_MODE = "auto"
+
+# --- Agent Time Limits (agent mode) ---
+# The parameter agents run concurrently; the whole fan-out must finish within the request deadline,
+# and a parameter that takes longer than its timeout is reported as unavailable instead of blocking the report.
+AGENT_REQUEST_DEADLINE_SECONDS = 60
+AGENT_DEFAULT_TIMEOUT_SECONDS = 45
+AGENT_PARAMETER_TIMEOUTS = {} # Per-parameter overrides, e.g. {"Rainfall": 30}
+
+# --- Coordinate Queries ---
+# "near 15.89, 80.04" reports on the nearest villages, "15.89, 80.04 within 10 km" on every village in range.
+# With interpolation the report (LLM or template) describes an inverse-distance-weighted estimate at the point itself.
+SPATIAL_INTERPOLATE = True
+
+# --- Response Cache ---
+# Forecast data and finished reports are cached per forecast run and resolved location.
+# Set a file path to also keep them on disk (SQLite) across restarts.
+RESPONSE_CACHE_DB_PATH = None
+
+# --- Instrumentation ---
+# Every turn is traced: stage timings, LLM calls with token counts, and cache hits.
+# Set a file path to append one JSON trace per turn; rolling p50/p95 latencies are printed when you quit.
+TRACE_LOG_PATH = None
+
+# --- Startup ---
+# The LLM client, the forecast data and the agents are created on first use. With PRELOAD_IN_BACKGROUND the
+# chatbot creates the ones it will need on a background thread once the prompt is shown, so the first answer
+# does not wait for them either. False: nothing is created before it is used.
+PRELOAD_IN_BACKGROUND = True
 
 # --- Debugging Flag ---
 # Set to True to see the internal thoughts and actions of each agent
 AGENT_VERBOSE_MODE = False # Default to False for cleaner output (Set True to debug agents)
 
-# --- Load API Key ---
-load_dotenv()
-api_key = os.getenv("GOOGLE_API_KEY")
+# --- Components (created on first use, then shared) ---
+# "llm": Gemini client, using gemini-1.5-flash for a balance of capability and speed (loads GOOGLE_API_KEY from .env).
+# "forecast_runs": the run manager with the newest forecast run. "agent:<run_id>:<parameter>": one CSV agent each.
+components = LazyComponents()
+components.register("llm", create_llm)
 
-if not api_key:
-    raise ValueError("GOOGLE_API_KEY not found in environment variables. Please set it in a .env file.")
+def synthesis_llm():
+    """Returns the LLM client for report synthesis, or None for template reports.
 
-# Configure the Google Generative AI client
-genai.configure(api_key=api_key)
-
-# --- Initialize LLM ---
-# Using gemini-1.5-flash for a balance of capability and speed.
-llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0.2)
+    In "template" mode the client is never created. In "auto" mode a client that cannot be created
+    (e.g. no GOOGLE_API_KEY) counts as an LLM failure: the template report is used and creation is
+    retried on the next turn. Only "llm" mode raises.
+    """
+    if SYNTHESIS_MODE == "template":
+        return None
+    try:
+        return components.get("llm")
+    except Exception as e:
+        if SYNTHESIS_MODE != "auto":
+            raise
+        print(f"LLM unavailable ({e}); using the template report.")
+        return None
 
 # --- Helper Function to Create Agents ---
 def create_agent_for_csv(csv_path, llm_instance, verbose_mode):
     """Creates a CSV agent for the given file path."""
+    # Imported here so the native retrieval mode does not need langchain_experimental at all
+    from langchain.agents.agent_types import AgentType
+    from langchain_experimental.agents.agent_toolkits import create_csv_agent
+
     agent_name = os.path.basename(csv_path) # Get filename for logging
     if not os.path.exists(csv_path):
         print(f"Warning: CSV file not found at {csv_path}. Agent '{agent_name}' creation skipped.")
@@ -58,71 +120,301 @@ def create_agent_for_csv(csv_path, llm_instance, verbose_mode):
         print(traceback.format_exc())
         return None
 
-# --- Create Individual Agents ---
-print("Initializing agents...")
-agent_rainfall = create_agent_for_csv(RAINFALL_CSV_PATH, llm, AGENT_VERBOSE_MODE)
-agent_humidity = create_agent_for_csv(HUMIDITY_CSV_PATH, llm, AGENT_VERBOSE_MODE)
-agent_windspeed = create_agent_for_csv(WINDSPEED_CSV_PATH, llm, AGENT_VERBOSE_MODE)
-agent_temperature = create_agent_for_csv(TEMPERATURE_CSV_PATH, llm, AGENT_VERBOSE_MODE) # Added Temperature agent
-print("Agent initialization complete.")
-
-# --- Determine Date Range (Assume consistent across files) ---
-forecast_start_date = "start date"
-forecast_end_date = "end date"
-date_columns_list = []
-try:
-    # Check all defined paths
-    valid_paths = [p for p in [RAINFALL_CSV_PATH, HUMIDITY_CSV_PATH, WINDSPEED_CSV_PATH, TEMPERATURE_CSV_PATH] if os.path.exists(p)]
-    first_valid_path = valid_paths[0] if valid_paths else None
-
-    if first_valid_path:
-        df_dates = pd.read_csv(first_valid_path, encoding='utf-8')
-        # Improved date column detection (basic format DD-MM-YY)
-        date_columns_list = [col for col in df_dates.columns if isinstance(col, str) and col.count('-') == 2 and all(part.isdigit() for part in col.split('-'))]
-
-        if date_columns_list:
-            try:
-                 date_columns_list.sort(key=lambda date: pd.to_datetime(date, format='%d-%m-%y', errors='coerce'))
-                 date_columns_list = [d for d in date_columns_list if pd.to_datetime(d, format='%d-%m-%y', errors='coerce') is not pd.NaT]
-            except Exception as sort_err:
-                 print(f"Warning: Could not sort date columns based on DD-MM-YY format: {sort_err}. Using CSV order.")
-
-            if date_columns_list:
-                forecast_start_date = date_columns_list[0]
-                forecast_end_date = date_columns_list[-1]
-                print(f"Detected forecast dates: {forecast_start_date} to {forecast_end_date}")
-            else:
-                print("Warning: No valid date columns found after attempting to parse/sort.")
+# --- Agents per Forecast Run (agent mode only) ---
+# Agents are bound to one run's CSV files, so each run gets its own set; only the newest run's are kept.
+def agent_name(run, param):
+    return f"agent:{run.run_id}:{param}"
+
+def agent_factory(run, param):
+    return lambda: create_agent_for_csv(run.csv_paths[param], components.get("llm"), AGENT_VERBOSE_MODE)
+
+def register_agents(run):
+    """Registers an agent factory for every parameter of run and forgets the agents of other runs. Returns their names."""
+    stale_run_ids = {name.split(":")[1] for name in components.names() if name.startswith("agent:")} - {run.run_id}
+    for run_id in stale_run_ids:
+        components.discard(f"agent:{run_id}:")
+    for param in run.csv_paths:
+        components.register(agent_name(run, param), agent_factory(run, param))
+    return [agent_name(run, param) for param in run.csv_paths]
+
+def agent_for(run, param):
+    """Returns the CSV agent for one parameter of run (None if it could not be created), creating it on first use."""
+    # The factory is only used for a run that was swapped out while a turn was still using it
+    return components.get(agent_name(run, param), agent_factory(run, param))
+
+# --- Response Cache (entries from any other run or data version are dropped) ---
+response_cache = ResponseCache(db_path=RESPONSE_CACHE_DB_PATH)
+
+# --- Query Traces ---
+tracer = Tracer(TRACE_LOG_PATH)
+
+def on_new_run(run):
+    """Called after a forecast run is swapped in."""
+    response_cache.activate_run(run.store)
+    if RETRIEVAL_MODE == "agent":
+        register_agents(run)
+    if run.store.dates:
+        print(f"Forecast run {run.run_id} loaded. Detected forecast dates: {run.start_date} to {run.end_date}")
+    else:
+        print(f"Forecast run {run.run_id} loaded. Warning: Could not automatically detect date columns with DD-MM-YY format.")
+
+# --- Load Forecast Data and Location Index ---
+# All parameters of a run are joined on SP_CODE into one store; the index's row offsets are shared by every parameter.
+# A current snapshot is memory-mapped; otherwise the CSVs are parsed once and a snapshot is written for next time.
+def load_forecast_runs():
+    """Creates the run manager, loads the newest complete run and starts watching DATA_DIR."""
+    print("Loading forecast data...")
+    run_manager = ForecastRunManager(DATA_DIR, SNAPSHOT_DIR, poll_seconds=RUN_POLL_SECONDS)
+    run_manager.add_listener(on_new_run)
+    if run_manager.load_latest() is None:
+        print(f"Warning: No complete forecast run found in {DATA_DIR}.")
+    if HOT_RELOAD:
+        run_manager.start()
+    return run_manager
+
+components.register("forecast_runs", load_forecast_runs)
+
+def current_run():
+    """Returns the active forecast run (None if no run could be loaded), loading the data on first use."""
+    return components.get("forecast_runs").current()
+
+# --- Agent-Based Retrieval (RETRIEVAL_MODE == "agent") ---
+def query_agents(run, user_input):
+    """Queries every parameter's CSV agent of run for user_input.
+
+    Returns (raw_results, location_found_somewhere).
+    """
+    location_found_somewhere = False
+    raw_results = {}
+    forecast_start_date, forecast_end_date = run.start_date, run.end_date
+
+    # --- ** BASE Agent Prompt - Focused on Data Extraction ** ---
+    # This prompt directs agents to ONLY extract data and use the loaded DataFrame.
+    base_data_prompt = f"""
+    You are an agent designed to query a specific CSV data file provided by the toolkit.
+    The user wants data for the location: '{user_input}'.
+
+    **CRITICAL INSTRUCTIONS:**
+    1.  **You MUST use the pandas DataFrame object that has ALREADY been loaded from the CSV file by the agent toolkit.** This DataFrame contains the full dataset for the specific parameter associated with you.
+    2.  **DO NOT generate Python code that creates a NEW DataFrame.** DO NOT use `pd.DataFrame(data={{...}})`. Operate ONLY on the existing DataFrame provided (often `df`).
+    3.  Search this existing DataFrame for rows matching '{user_input}'. The search must be case-insensitive and check 'VILLAGE', 'MANDAL', 'DISTRICT' columns. Apply `.str.strip()` before checking with `.str.contains('{user_input}', case=False, na=False)`. Combine conditions with `|`.
+    4.  If matching rows are found:
+        *   For EACH match, extract 'VILLAGE', 'MANDAL', 'DISTRICT'.
+        *   Extract data values from all relevant date columns (like '{forecast_start_date}' to '{forecast_end_date}'). Only use columns present in the DataFrame.
+        *   Format EACH match as a string: "Location: [Village], [Mandal], [District]. Data: [Date1]: [Value1], [Date2]: [Value2], ...". Include all date columns found.
+        *   Combine strings for multiple matches with newlines (`\n`).
+    5.  If NO matching rows are found after searching the loaded DataFrame, return the exact string: "Location '{user_input}' not found."
+    6.  Your final response MUST ONLY be the formatted data string(s) from step 4, OR the "not found" message from step 5. No extra text.
+    """
+
+    # --- Invoke Agents (concurrently, bounded by the request deadline) ---
+    # Each task creates its agent on first use, so the agents of a new run are built in parallel
+    def make_task(param):
+        def task():
+            agent = agent_for(run, param)
+            if agent is None:
+                return None
+            print(f"Querying {param} Agent...")
+            agent_specific_prompt = f"Get {param.lower()} data. {base_data_prompt}"
+            with stage(f"agent:{param}"):
+                response = agent.invoke({"input": agent_specific_prompt})
+            return response.get('output', f"{param} Agent: Error retrieving output key.")
+        return task
+
+    tasks = {param: make_task(param) for param in run.csv_paths}
+    fetched = fetch_all(tasks, AGENT_REQUEST_DEADLINE_SECONDS, AGENT_PARAMETER_TIMEOUTS, AGENT_DEFAULT_TIMEOUT_SECONDS)
+
+    for param in run.csv_paths:
+        status, result = fetched[param]
+        if status == "ok" and result is None:
+            raw_results[param] = f"{param} forecast unavailable (Agent not initialized)."
+        elif status == "timeout":
+            print(f"{param} agent did not answer in time.")
+            raw_results[param] = f"{param} forecast unavailable (Agent timed out)."
+        elif status == "error":
+            raw_results[param] = f"{param} forecast unavailable (Agent Query Error)."
+        elif result and f"Location '{user_input}' not found." not in result and "Error" not in result:
+            raw_results[param] = result.strip()
+            if "Location:" in result and "Data:" in result:
+                location_found_somewhere = True
         else:
-             print("Warning: Could not automatically detect date columns with DD-MM-YY format.")
+            raw_results[param] = result # Store "not found" or error
+
+    return raw_results, location_found_somewhere
+
+
+# --- Native Retrieval (RETRIEVAL_MODE == "native") ---
+def resolve_query(run, user_input):
+    """Resolves user_input through the run's location index, announcing any fuzzy match.
+
+    Returns (rows, canonical location used as the cache key).
+    """
+    rows, resolved_name, candidates = resolve_location(run.location_index, user_input)
+
+    # --- Fuzzy Fallback (misspelled place names) ---
+    if resolved_name:
+        best_name, best_level, _ = candidates[0]
+        print(f"No exact match for '{user_input}'. Showing the closest match: {best_name} ({best_level.title()}).")
+        if len(candidates) > 1:
+            print("Other close matches: " + ", ".join(f"{name} ({level.title()})" for name, level, _ in candidates[1:]))
+
+    return rows, canonical_location(user_input, resolved_name)
+
+
+def resolve_point_query(run, lat, lon, radius_km):
+    """Finds the locations around a coordinate and lists them with their distances.
+
+    Returns (rows, distances_km, canonical location used as the cache key).
+    """
+    rows, distances, location = resolve_coordinates(run.spatial_index, lat, lon, radius_km)
+    if len(rows):
+        scope = f"within {radius_km:g} km of" if radius_km is not None else "nearest to"
+        print(f"Forecast locations {scope} {describe_point(lat, lon)}:")
+        for (village, mandal, district), distance in zip(run.store.location_names[rows[:5]], distances[:5]):
+            print(f"  {village}, {mandal}, {district} ({distance:.1f} km)")
+        if len(rows) > 5:
+            print(f"  ...and {len(rows) - 5} more.")
+    return rows, distances, location
+
+
+def query_forecast_data(run, rows, location, user_input, point=None):
+    """Returns (raw_results, location_found_somewhere) for the resolved rows, in the same shape as query_agents.
+
+    point is (lat, lon, distances_km) for a coordinate query.
+    """
+    store = run.store
+    kind = "data" if point is None else f"data:{'idw' if SPATIAL_INTERPOLATE else 'nearest'}"
+    cached = response_cache.get(store, location, REPORT_PARAMETERS, kind)
+    if cached is not None:
+        return cached["raw_results"], cached["found"]
+    if point is not None:
+        lat, lon, distances = point
+        raw_results, location_found_somewhere = collect_point_data(store, rows, distances, lat, lon, SPATIAL_INTERPOLATE)
     else:
-        print("Warning: No valid CSV found to determine date range.")
-except Exception as e:
-    print(f"Warning: Error processing CSV for date range: {e}")
-    print(traceback.format_exc())
+        raw_results, location_found_somewhere = collect_forecast_data(store, rows, user_input)
+    response_cache.put(store, location, REPORT_PARAMETERS, kind, {"raw_results": raw_results, "found": location_found_somewhere})
+    return raw_results, location_found_somewhere
+
+
+# --- Regional and Alert Questions ---
+def answer_regional_question(run, user_input, query):
+    """Answers e.g. "max wind per district" from the run's precomputed rollups and prints the answer."""
+    location = "regional:" + json.dumps(query, sort_keys=True)
+    report_kind = f"report:regional:{SYNTHESIS_MODE}"
+    answer = response_cache.get(run.store, location, REPORT_PARAMETERS, report_kind)
+    if answer is None:
+        try:
+            with stage("regional"):
+                result = answer_regional_query(run.regional_stats, query)
+        except ValueError as e:
+            print("\nWeather Bot:")
+            print(e)
+            return
+        print(f"{len(result['rows'])} result(s) computed. Generating answer...")
+        with stage("synthesis") as record:
+            answer, mode_used = synthesize_regional_answer(synthesis_llm(), user_input, result, SYNTHESIS_MODE)
+            record["mode"] = mode_used
+        if not (SYNTHESIS_MODE == "auto" and mode_used != "llm"):
+            response_cache.put(run.store, location, REPORT_PARAMETERS, report_kind, answer)
+    print("\nWeather Bot:")
+    print(answer)
+
+
+# --- One Turn ---
+def answer_turn(user_input):
+    """Answers one question and prints the reply. Each step is timed as a stage of the current trace."""
+    # The whole turn uses one run, even if a newer one is swapped in meanwhile
+    run = current_run()
+    store = run.store
+    current_trace().set(run_id=run.run_id)
+
+    # --- Regional and Alert Questions (answered from the rollups, no location lookup) ---
+    regional_query = parse_regional_query(user_input)
+    if regional_query:
+        answer_regional_question(run, user_input, regional_query)
+        return
+
+    # --- Cached Report (same run, same resolved location) ---
+    # Coordinate queries always use the native spatial index (the CSV agents only match names)
+    spatial_query = parse_spatial_query(user_input)
+    with stage("resolve"):
+        if spatial_query:
+            lat, lon, radius_km = spatial_query
+            rows, distances, location = resolve_point_query(run, lat, lon, radius_km)
+            report_kind = f"report:native:{SYNTHESIS_MODE}:{'idw' if SPATIAL_INTERPOLATE else 'nearest'}"
+        elif RETRIEVAL_MODE == "agent":
+            location = canonical_location(user_input)
+            report_kind = f"report:agent:{SYNTHESIS_MODE}"
+        else:
+            rows, location = resolve_query(run, user_input)
+            report_kind = f"report:native:{SYNTHESIS_MODE}"
+    report = response_cache.get(store, location, REPORT_PARAMETERS, report_kind)
+    if report is not None:
+        print("\nWeather Bot:")
+        print(report)
+        return
+
+    with stage("retrieve"):
+        if spatial_query:
+            raw_results, location_found_somewhere = query_forecast_data(run, rows, location, user_input, (lat, lon, distances))
+        elif RETRIEVAL_MODE == "agent":
+            raw_results, location_found_somewhere = query_agents(run, user_input)
+            rows = resolve_location(run.location_index, user_input)[0] # Only used by the template report
+        else:
+            raw_results, location_found_somewhere = query_forecast_data(run, rows, location, user_input)
+
+    print("Data retrieval complete. Synthesizing report...")
+
+    # --- Synthesize Results ---
+    if not location_found_somewhere:
+        print("\nWeather Bot:")
+        if spatial_query:
+            scope = f"within {radius_km:g} km of" if radius_km is not None else "near"
+            print(f"No forecast locations {scope} {describe_point(lat, lon)}.")
+        else:
+            print(f"Location '{user_input}' not found in any available forecast dataset.")
+        return
+
+    # --- Generate the Final Report (LLM synthesis and/or local template) ---
+    print("Generating final report...")
+    with stage("synthesis") as record:
+        point = (lat, lon, distances) if spatial_query and SPATIAL_INTERPOLATE else None
+        report, mode_used = synthesize_report(synthesis_llm(), store, rows, user_input, raw_results, SYNTHESIS_MODE, point=point)
+        record["mode"] = mode_used
+    # A template fallback in "auto" mode is not cached, so the next ask gets another LLM attempt
+    if not (SYNTHESIS_MODE == "auto" and mode_used != "llm"):
+        response_cache.put(store, location, REPORT_PARAMETERS, report_kind, report)
+
+    print("\nWeather Bot:")
+    print(report)
+
 
 # --- Chatbot Interaction Logic ---
 def chat_with_weather_bot():
     """Handles the conversation loop with the user."""
-    global forecast_start_date, forecast_end_date, date_columns_list
+    run = current_run()
 
     print("\n--- Multi-Parameter Weather Chatbot ---")
-    print("Hi! I can provide forecasts for Rainfall, Humidity, Wind Speed, and Temperature.")
-    if date_columns_list:
-        print(f"Forecasts available from {forecast_start_date} to {forecast_end_date}.")
+    print("Hi! I can provide forecasts for Rainfall, Humidity, Wind Speed, Temperature, and Heat Index.")
+    if run.store.dates:
+        print(f"Forecasts available from {run.start_date} to {run.end_date}.")
     else:
         print("Warning: Forecast date range could not be determined.")
     print(">>> Please enter only the Village, Mandal, or District name. <<<")
+    print("You can also ask for a coordinate, e.g. 'near 15.89, 80.04' or '15.89, 80.04 within 10 km',")
+    print("or about regions, e.g. 'max wind per district' or 'which mandals in KURNOOL expect more than 2 units of rain on 11-04-25'.")
     print("Type 'quit' or 'exit' to end the chat.")
 
     while True:
-        location_found_somewhere = False
-        raw_results = {}
-
         try:
             user_input = input("\nEnter location name (or 'quit'): ").strip()
 
             if user_input.lower() in ["quit", "exit"]:
+                print(f"Response cache: {response_cache.stats()}")
+                print("Latency (rolling):")
+                print(tracer.summary())
+                tracer.close()
+                components.get("forecast_runs").stop()
                 print("Goodbye!")
                 break
 
@@ -136,102 +428,8 @@ def chat_with_weather_bot():
 
             print(f"\nFetching forecast data for '{user_input}'...")
 
-            # --- ** BASE Agent Prompt - Focused on Data Extraction ** ---
-            # This prompt directs agents to ONLY extract data and use the loaded DataFrame.
-            base_data_prompt = f"""
-            You are an agent designed to query a specific CSV data file provided by the toolkit.
-            The user wants data for the location: '{user_input}'.
-
-            **CRITICAL INSTRUCTIONS:**
-            1.  **You MUST use the pandas DataFrame object that has ALREADY been loaded from the CSV file by the agent toolkit.** This DataFrame contains the full dataset for the specific parameter associated with you.
-            2.  **DO NOT generate Python code that creates a NEW DataFrame.** DO NOT use `pd.DataFrame(data={{...}})`. Operate ONLY on the existing DataFrame provided (often `df`).
-            3.  Search this existing DataFrame for rows matching '{user_input}'. The search must be case-insensitive and check 'VILLAGE', 'MANDAL', 'DISTRICT' columns. Apply `.str.strip()` before checking with `.str.contains('{user_input}', case=False, na=False)`. Combine conditions with `|`.
-            4.  If matching rows are found:
-                *   For EACH match, extract 'VILLAGE', 'MANDAL', 'DISTRICT'.
-                *   Extract data values from all relevant date columns (like '{forecast_start_date}' to '{forecast_end_date}'). Only use columns present in the DataFrame.
-                *   Format EACH match as a string: "Location: [Village], [Mandal], [District]. Data: [Date1]: [Value1], [Date2]: [Value2], ...". Include all date columns found.
-                *   Combine strings for multiple matches with newlines (`\n`).
-            5.  If NO matching rows are found after searching the loaded DataFrame, return the exact string: "Location '{user_input}' not found."
-            6.  Your final response MUST ONLY be the formatted data string(s) from step 4, OR the "not found" message from step 5. No extra text.
-            """
-
-            # --- Invoke Agents ---
-            # Extended to include Temperature
-            agents = {
-                "Rainfall": agent_rainfall,
-                "Humidity": agent_humidity,
-                "Wind Speed": agent_windspeed,
-                "Temperature": agent_temperature # Added Temperature
-            }
-
-            for param, agent in agents.items():
-                if agent:
-                    try:
-                        print(f"Querying {param} Agent...")
-                        agent_specific_prompt = f"Get {param.lower()} data. {base_data_prompt}"
-                        response = agent.invoke({"input": agent_specific_prompt})
-                        result = response.get('output', f"{param} Agent: Error retrieving output key.")
-
-                        if result and f"Location '{user_input}' not found." not in result and "Error" not in result:
-                             raw_results[param] = result.strip()
-                             if "Location:" in result and "Data:" in result:
-                                 location_found_somewhere = True
-                        else:
-                             raw_results[param] = result # Store "not found" or error
-
-                    except Exception as e:
-                        print(f"Error invoking {param} agent: {e}")
-                        print(traceback.format_exc())
-                        raw_results[param] = f"{param} forecast unavailable (Agent Query Error)."
-                else:
-                     raw_results[param] = f"{param} forecast unavailable (Agent not initialized)."
-
-
-            print("Data retrieval complete. Synthesizing report...")
-
-            # --- Synthesize Results ---
-            if not location_found_somewhere:
-                print("\nWeather Bot:")
-                print(f"Location '{user_input}' not found in any available forecast dataset.")
-                continue
-
-            # --- ** Synthesis Prompt - For Combining Results ** ---
-            synthesis_prompt = f"""
-            You are a weather report compiler. Synthesize the following forecast data fragments for the user query '{user_input}' into a single, easy-to-read report using a simple narrative style.
-
-            Forecast Period: {forecast_start_date} to {forecast_end_date}
-
-            Data Fragments Provided:
-            - Rainfall Data String: {raw_results.get("Rainfall", "Not Available")}
-            - Humidity Data String: {raw_results.get("Humidity", "Not Available")}
-            - Wind Speed Data String: {raw_results.get("Wind Speed", "Not Available")}
-            - Temperature Data String: {raw_results.get("Temperature", "Not Available")}
-
-            Instructions for the Final Report:
-            1.  Identify the primary location details (Village, Mandal, District) from the fragments containing valid data (look for "Location:" and "Data:"). Use the first complete location found.
-            2.  If no valid data fragments exist, state forecast is unavailable.
-            3.  Format the report:
-                *   Title: **Local Weather Forecast**
-                *   Location: **Location:** Village Name, Mandal Name, District Name.
-                *   Outlook Period: **Outlook ({forecast_start_date} - {forecast_end_date}):**
-                *   Summary Paragraph: Concisely interpret the data from the VALID fragments:
-                    *   **Rainfall:** Describe expected rain ("Light showers...", "Dry conditions...", "Rainfall around [Value] units on [Date]..."). State if unavailable.
-                    *   **Humidity:** Describe humidity levels ("Relative humidity around X-Y%...", "Higher humidity expected...", "Moderate levels..."). State if unavailable. (Assume %).
-                    *   **Wind Speed:** Describe wind conditions ("Winds light/moderate/strong (X-Y units)...", "Strongest winds on [Date]..."). Specify units like km/h if known/implied. State if unavailable.
-                    *   **Temperature:** Describe temperature trends ("Temperatures expected around X-Y degrees [specify C/F if known]...", "Cooler towards [Date]...", "Temperatures peaking near..."). State if unavailable.
-                    *   Combine these points smoothly into one or two narrative paragraphs.
-            4.  Interpret the data, don't just list it. Report ONLY based on provided fragments. Handle missing parameters gracefully. Do not mention the source strings or agents.
-
-            Generate the final synthesized weather report now.
-            """
-
-            # Invoke the main LLM for synthesis
-            print("Generating final report...")
-            final_response = llm.invoke(synthesis_prompt)
-
-            print("\nWeather Bot:")
-            print(final_response.content)
-
+            with tracer.trace(user_input, retrieval_mode=RETRIEVAL_MODE, synthesis_mode=SYNTHESIS_MODE):
+                answer_turn(user_input)
 
         except Exception as e:
             print(f"\nAn critical error occurred in the main loop: {e}")
@@ -240,10 +438,15 @@ def chat_with_weather_bot():
 
 # --- Start the Chatbot ---
 if __name__ == "__main__":
-    active_agents = [agent for agent in [agent_rainfall, agent_humidity, agent_windspeed, agent_temperature] if agent is not None]
-    if not active_agents:
-        print("\nFatal Error: No forecast agents could be initialized.")
-        print("Please check CSV file paths and ensure the files exist and are readable.")
+    run = current_run()
+    if not run:
+        print("\nFatal Error: No forecast data could be loaded.")
+        print("Please check DATA_DIR and ensure the CSV files exist and are readable.")
     else:
-        print(f"\n{len(active_agents)} agent(s) initialized successfully.")
-        chat_with_weather_bot()
\ No newline at end of file
+        if PRELOAD_IN_BACKGROUND:
+            # Built while the user types the first question; a question that needs one earlier just waits for it
+            preload = ["llm"] if SYNTHESIS_MODE != "template" or RETRIEVAL_MODE == "agent" else []
+            preload += register_agents(run) if RETRIEVAL_MODE == "agent" else []
+            components.preload(preload, background=True)
+        print(f"\n{len(run.store.parameters)} forecast parameter(s) loaded successfully.")
+        chat_with_weather_bot()
@@ -0,0 +1,161 @@
+from datetime import datetime
+import numpy as np
+from spatial_index import idw_interpolate
+
+# --- Configuration ---
+# Values at or below this are treated as no rain (the data carries float noise such as 2.8e-14)
+RAIN_THRESHOLD = 0.005
+# Daily rainfall above this is described as significant
+HEAVY_RAIN_THRESHOLD = 2.0
+# Upper bounds of "light" and "moderate" winds (dataset units, assumed km/h)
+LIGHT_WIND_MAX = 12.0
+MODERATE_WIND_MAX = 25.0
+# Change in mean temperature between the start and end of the period that counts as a trend (degrees)
+TEMPERATURE_TREND_THRESHOLD = 1.0
+
+
+# --- Date Formatting ---
+def ordinal(day):
+    if 11 <= day % 100 <= 13:
+        return f"{day}th"
+    return f"{day}{({1: 'st', 2: 'nd', 3: 'rd'}).get(day % 10, 'th')}"
+
+
+def parse_date(date):
+    return datetime.strptime(date, '%d-%m-%y')
+
+
+def format_day(date):
+    """Formats a DD-MM-YY column name as e.g. "April 10th"."""
+    parsed = parse_date(date)
+    return f"{parsed.strftime('%B')} {ordinal(parsed.day)}"
+
+
+def format_day_range(first, last):
+    """Formats two DD-MM-YY dates as "April 12th through 17th" (or "April 30th through May 2nd")."""
+    start, end = parse_date(first), parse_date(last)
+    if start.month == end.month:
+        return f"{format_day(first)} through {ordinal(end.day)}"
+    return f"{format_day(first)} through {format_day(last)}"
+
+
+def consecutive_runs(mask):
+    """Returns (start, end) index pairs (inclusive) of the runs of True in a boolean array."""
+    padded = np.concatenate([[False], mask, [False]])
+    edges = np.flatnonzero(np.diff(padded.astype(np.int8)))
+    return list(zip(edges[::2], edges[1::2] - 1))
+
+
+# --- Per-Parameter Sentences ---
+def describe_rainfall(values, dates):
+    rainy = values > RAIN_THRESHOLD
+    if not rainy.any():
+        return "No rainfall is anticipated during the forecast period."
+    parts = []
+    wettest = int(np.argmax(values))
+    if values[wettest] > HEAVY_RAIN_THRESHOLD:
+        parts.append(f"Significant rainfall is predicted, peaking at {values[wettest]:.2f} units on {format_day(dates[wettest])}.")
+    rain_days = ", ".join(f"{format_day(dates[i])} ({values[i]:.2f} units)" for i in np.flatnonzero(rainy))
+    label = "Light showers are expected" if values.max() <= HEAVY_RAIN_THRESHOLD / 2 else "Rainfall is forecast"
+    parts.append(f"{label} on {rain_days}.")
+    dry_spells = [(start, end) for start, end in consecutive_runs(~rainy) if end > start]
+    if dry_spells:
+        spells = " and ".join(format_day_range(dates[start], dates[end]) for start, end in dry_spells)
+        parts.append(f"No rainfall is anticipated from {spells}.")
+    return " ".join(parts)
+
+
+def describe_humidity(values, dates):
+    low, high = int(np.argmin(values)), int(np.argmax(values))
+    return (
+        f"Relative humidity ranges from {values[low]:.0f}% to {values[high]:.0f}%, "
+        f"highest on {format_day(dates[high])} and lowest on {format_day(dates[low])}."
+    )
+
+
+def describe_wind(values, dates):
+    strongest = int(np.argmax(values))
+    peak = values[strongest]
+    strength = "light" if peak <= LIGHT_WIND_MAX else "moderate" if peak <= MODERATE_WIND_MAX else "strong"
+    return (
+        f"Winds are {strength} ({values.min():.0f}-{peak:.0f} km/h), "
+        f"strongest on {format_day(dates[strongest])}."
+    )
+
+
+def describe_temperature(values, dates):
+    hottest = int(np.argmax(values))
+    third = max(len(values) // 3, 1)
+    change = values[-third:].mean() - values[:third].mean()
+    if change > TEMPERATURE_TREND_THRESHOLD:
+        trend = f"warming towards {format_day(dates[-1])}"
+    elif change < -TEMPERATURE_TREND_THRESHOLD:
+        trend = f"cooling towards {format_day(dates[-1])}"
+    else:
+        trend = "staying fairly steady"
+    return (
+        f"Temperatures are expected around {values.min():.0f}-{values.max():.0f}°C, {trend}, "
+        f"peaking near {values[hottest]:.0f}°C on {format_day(dates[hottest])}."
+    )
+
+
+def describe_heat_index(values, dates):
+    worst = int(np.argmax(values))
+    return (
+        f"It will feel like {values.min():.0f}-{values.max():.0f}°C, "
+        f"most uncomfortable on {format_day(dates[worst])}."
+    )
+
+
+PARAMETER_DESCRIBERS = {
+    "Rainfall": describe_rainfall,
+    "Humidity": describe_humidity,
+    "Wind Speed": describe_wind,
+    "Temperature": describe_temperature,
+    "Heat Index": describe_heat_index,
+}
+
+
+# --- Report ---
+def render_report(store, rows, point=None):
+    """Renders the Local Weather Forecast report for the first matched row, without an LLM.
+
+    Produces the same **Local Weather Forecast** / **Location:** / **Outlook (...):**
+    layout as the LLM synthesis; the output depends only on the data. With point
+    = (lat, lon, distances_km) of a coordinate query (rows nearest first), the
+    report describes the inverse-distance-weighted estimate at the point instead.
+    """
+    if not len(rows):
+        return "Forecast is unavailable for this location."
+    village, mandal, district = store.location_names[rows[0]]
+    dates = store.dates
+    if point is None:
+        location = f"{village}, {mandal}, {district}"
+        row_values = np.asarray(store.values[rows[0]], dtype=np.float64).round(2)
+        footer = f"({len(rows) - 1} other matching locations not shown.)" if len(rows) > 1 else None
+    else:
+        lat, lon, distances = point
+        location = f"{lat:.4f}, {lon:.4f} (interpolated from {len(rows)} nearby locations)"
+        row_values = idw_interpolate(store.values[rows], distances).round(2)
+        footer = f"(Nearest forecast location: {village}, {mandal}, {district}, {distances[0]:.1f} km away.)"
+
+    sentences = []
+    for param, describe in PARAMETER_DESCRIBERS.items():
+        if not store.has_parameter(param):
+            sentences.append(f"{param} forecast is unavailable.")
+            continue
+        values = row_values[store.parameter_positions[param]]
+        known = ~np.isnan(values)
+        if not known.any():
+            sentences.append(f"{param} forecast is unavailable.")
+        else:
+            sentences.append(describe(values[known], [date for date, ok in zip(dates, known) if ok]))
+
+    lines = [
+        "**Local Weather Forecast**",
+        f"**Location:** {location}.",
+        (f"**Outlook ({dates[0]} - {dates[-1]}):** " if dates else "**Outlook:** ") + " ".join(sentences),
+    ]
+    if footer:
+        lines.append(footer)
+    return "\n".join(lines)
@@ -0,0 +1,349 @@
+import operator
+import re
+import numpy as np
+import pandas as pd
+from location_index import normalize_name
+
+# --- Configuration ---
+REGION_LEVELS = ("DISTRICT", "MANDAL")
+AGGREGATES = ("min", "max", "mean", "sum")
+AGGREGATE_LABELS = {"min": "Minimum", "max": "Maximum", "mean": "Average", "sum": "Total"}
+# Rows listed in a formatted regional answer (the structured result keeps all of them)
+REGIONAL_RESULT_LIMIT = 25
+
+COMPARISONS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+
+# --- Question Vocabulary ---
+PARAMETER_ALIASES = {
+    "Rainfall": ("rainfall", "rain"),
+    "Humidity": ("relative humidity", "humidity"),
+    "Wind Speed": ("wind speed", "wind"),
+    "Temperature": ("temperature", "temp"),
+    "Heat Index": ("heat index", "feels like"),
+}
+AGGREGATE_ALIASES = {
+    "min": ("minimum", "lowest", "min"),
+    "max": ("maximum", "highest", "peak", "max"),
+    "mean": ("average", "mean", "avg"),
+    "sum": ("total", "sum", "cumulative"),
+}
+COMPARISON_PATTERN = re.compile(
+    r"(?P<op>more than|greater than|at least|at most|less than|fewer than|above|over|exceeding|below|under|>=|<=|>|<)\s*(?P<value>[-+]?\d+(?:\.\d+)?)",
+    re.IGNORECASE,
+)
+COMPARISON_WORDS = {
+    "more than": ">", "greater than": ">", "above": ">", "over": ">", "exceeding": ">", "at least": ">=",
+    "less than": "<", "fewer than": "<", "below": "<", "under": "<", "at most": "<=",
+}
+LEVEL_PATTERN = re.compile(r"\b(district|mandal|village|location)s?\b", re.IGNORECASE)
+DATE_PATTERN = re.compile(r"\b\d{2}-\d{2}-\d{2}\b")
+REGION_FILTER_PATTERN = re.compile(
+    r"\bin\s+(?P<name>[a-z][\w .'-]*?)(?=\s+(?:with|expect\w*|ha(?:ve|s)|where|on|this|during|for|is|are|[<>])\b|\s*[<>]|\s*\?|\s*$)",
+    re.IGNORECASE,
+)
+
+
+class RegionalStats:
+    """District and mandal rollups of a forecast store, computed once with NumPy.
+
+    For every region level the min/max/mean/sum (and count of known values) of
+    every parameter and day are kept as (n_regions, n_parameters, n_days)
+    arrays. Mandals are grouped by (DISTRICT, MANDAL), since some mandal names
+    occur in more than one district.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        districts = store.metadata["DISTRICT"].astype(str).str.strip().to_numpy()
+        mandals = store.metadata["MANDAL"].astype(str).str.strip().to_numpy()
+        self.region_ids = {}
+        self.region_names = {}
+        self.region_districts = {}
+        self.region_keys = {}
+        self.rollups = {}
+        for level in REGION_LEVELS:
+            if level == "DISTRICT":
+                codes, uniques = pd.factorize(pd.Series(districts), sort=True)
+                names = np.asarray(uniques, dtype=object)
+                region_districts = names
+            else:
+                pairs = pd.MultiIndex.from_arrays([districts, mandals])
+                codes, uniques = pd.factorize(pairs, sort=True)
+                names = np.asarray([mandal for _, mandal in uniques], dtype=object)
+                region_districts = np.asarray([district for district, _ in uniques], dtype=object)
+            self.region_ids[level] = codes
+            self.region_names[level] = names
+            self.region_districts[level] = region_districts
+            self.region_keys[level] = np.asarray([normalize_name(name) for name in names], dtype=object)
+            self.rollups[level] = self._rollup(store.values, codes, len(names))
+
+    @staticmethod
+    def _rollup(values, codes, n_regions):
+        """Group-by over the location axis with reduceat on the rows sorted by region.
+
+        Works on one parameter at a time in the store's float32, so the extra
+        memory is one (locations, days) slice rather than copies of the whole
+        (possibly memory-mapped) values block. Sums are accumulated in float64.
+        """
+        order = np.argsort(codes, kind="stable")
+        starts = np.searchsorted(codes[order], np.arange(n_regions))
+        n_params, n_days = values.shape[1], values.shape[2]
+        rollup = {aggregate: np.empty((n_regions, n_params, n_days)) for aggregate in ("min", "max", "sum")}
+        rollup["count"] = np.empty((n_regions, n_params, n_days), dtype=np.int64)
+        for p in range(n_params):
+            # Day-major (days, locations), so each reduceat runs over contiguous memory (several times faster)
+            grouped = np.ascontiguousarray(values[order, p, :].T)
+            rollup["min"][:, p] = np.fmin.reduceat(grouped, starts, axis=1).T
+            rollup["max"][:, p] = np.fmax.reduceat(grouped, starts, axis=1).T
+            missing = np.isnan(grouped)
+            rollup["count"][:, p] = np.add.reduceat(~missing, starts, axis=1, dtype=np.int64).T
+            grouped[missing] = 0  # grouped is a copy; zeroed in place for the sums
+            rollup["sum"][:, p] = np.add.reduceat(grouped, starts, axis=1, dtype=np.float64).T
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rollup["mean"] = np.where(rollup["count"] > 0, rollup["sum"] / rollup["count"], np.nan)
+        return rollup
+
+    # --- Helpers ---
+    def date_positions(self, dates=None):
+        """Day positions for a list of DD-MM-YY dates (all days when dates is None)."""
+        if dates is None:
+            return np.arange(len(self.store.dates))
+        positions = []
+        for date in dates:
+            if date not in self.store.dates:
+                raise ValueError(f"No forecast for {date}; the forecast covers {self.store.dates[0]} to {self.store.dates[-1]}.")
+            positions.append(self.store.dates.index(date))
+        return np.asarray(positions)
+
+    def find_region(self, name):
+        """Resolves a district or mandal name to (level, region positions). Districts win over mandals."""
+        key = normalize_name(name)
+        for level in REGION_LEVELS:
+            matches = np.flatnonzero(self.region_keys[level] == key)
+            if len(matches):
+                return level, matches
+        return None, None
+
+    def _regions_within(self, level, within):
+        """Positions of the regions of level inside the named district (or that mandal)."""
+        regions = np.arange(len(self.region_names[level]))
+        if within is None:
+            return regions
+        within_level, matches = self.find_region(within)
+        if within_level is None:
+            raise ValueError(f"Unknown district or mandal: {within}")
+        if within_level == level:
+            return matches
+        if level == "MANDAL":
+            districts = self.region_names["DISTRICT"][matches]
+            return regions[np.isin(self.region_districts[level], districts)]
+        raise ValueError(f"{within} is a mandal; districts cannot be listed within it.")
+
+    def _rows_within(self, within):
+        """Store rows inside the named district or mandal (every row when within is None)."""
+        if within is None:
+            return np.arange(len(self.store))
+        level, matches = self.find_region(within)
+        if level is None:
+            raise ValueError(f"Unknown district or mandal: {within}")
+        return np.flatnonzero(np.isin(self.region_ids[level], matches))
+
+    # --- Queries ---
+    def rollup(self, level, param, aggregate, dates=None, within=None, over_period=True):
+        """Aggregates param per region.
+
+        Returns a list of {"region", "district", "value"} dicts (plus "date" per day
+        when over_period is False), in region order.
+        """
+        level, param_position = level.upper(), self.store.parameter_positions[param]
+        rollup = self.rollups[level]
+        days = self.date_positions(dates)
+        regions = self._regions_within(level, within)
+        per_day = rollup[aggregate][regions, param_position][:, days]
+
+        if over_period:
+            if aggregate == "min":
+                values = np.fmin.reduce(per_day, axis=1)
+            elif aggregate == "max":
+                values = np.fmax.reduce(per_day, axis=1)
+            elif aggregate == "sum":
+                values = per_day.sum(axis=1)
+            else:
+                counts = rollup["count"][regions, param_position][:, days].sum(axis=1)
+                sums = rollup["sum"][regions, param_position][:, days].sum(axis=1)
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    values = np.where(counts > 0, sums / counts, np.nan)
+            return [
+                {"region": self.region_names[level][r], "district": self.region_districts[level][r], "value": float(v)}
+                for r, v in zip(regions, values)
+            ]
+        return [
+            {"region": self.region_names[level][r], "district": self.region_districts[level][r], "date": self.store.dates[d], "value": float(v)}
+            for r, row in zip(regions, per_day) for d, v in zip(days, row)
+        ]
+
+    def scan_locations(self, param, op, threshold, dates=None, within=None):
+        """Finds every location whose param satisfies op threshold on any of the dates.
+
+        One vectorized comparison over (locations x days). Returns a list of
+        {"row", "village", "mandal", "district", "dates", "peak_date", "peak_value"}
+        dicts, most extreme first.
+        """
+        compare = COMPARISONS[op]
+        days = self.date_positions(dates)
+        rows = self._rows_within(within)
+        values = np.asarray(self.store.parameter_values(param)[rows][:, days], dtype=np.float64)
+        with np.errstate(invalid="ignore"):
+            hits = compare(values, threshold)
+        hit_rows = np.flatnonzero(hits.any(axis=1))
+        if not len(hit_rows):
+            return []
+        extreme = np.where(hits[hit_rows], values[hit_rows], np.nan)
+        peak_days = np.nanargmax(extreme, axis=1) if op in (">", ">=") else np.nanargmin(extreme, axis=1)
+        peak_values = extreme[np.arange(len(hit_rows)), peak_days]
+        order = np.argsort(-peak_values if op in (">", ">=") else peak_values, kind="stable")
+        results = []
+        for i in order:
+            row = int(rows[hit_rows[i]])
+            village, mandal, district = self.store.location_names[row]
+            results.append({
+                "row": row, "village": village, "mandal": mandal, "district": district,
+                "dates": [self.store.dates[days[d]] for d in np.flatnonzero(hits[hit_rows[i]])],
+                "peak_date": self.store.dates[days[peak_days[i]]],
+                "peak_value": float(peak_values[i]),
+            })
+        return results
+
+    def scan_regions(self, level, param, op, threshold, dates=None, within=None, aggregate=None):
+        """Finds the regions of level where param satisfies op threshold on any of the dates.
+
+        Without aggregate, a region qualifies when any of its locations does; the
+        result counts those locations. With aggregate, the region's rollup
+        (e.g. its mean) is compared instead. Returns a list of {"region",
+        "district", "value", "date", "locations"} dicts, most extreme first.
+        """
+        level = level.upper()
+        compare = COMPARISONS[op]
+        days = self.date_positions(dates)
+        regions = self._regions_within(level, within)
+        param_position = self.store.parameter_positions[param]
+        rising = op in (">", ">=")
+        # Any location qualifies <=> the region's max (for > / >=) or min (for < / <=) does
+        per_day = self.rollups[level][aggregate or ("max" if rising else "min")][regions, param_position][:, days]
+        with np.errstate(invalid="ignore"):
+            hits = compare(per_day, threshold)
+        hit_regions = np.flatnonzero(hits.any(axis=1))
+
+        location_counts = None
+        if aggregate is None and len(hit_regions):
+            rows = np.flatnonzero(np.isin(self.region_ids[level], regions[hit_regions]))
+            values = np.asarray(self.store.parameter_values(param)[rows][:, days], dtype=np.float64)
+            with np.errstate(invalid="ignore"):
+                qualifying = compare(values, threshold).any(axis=1)
+            location_counts = np.bincount(self.region_ids[level][rows[qualifying]], minlength=len(self.region_names[level]))
+
+        results = []
+        for i in hit_regions:
+            extreme = np.where(hits[i], per_day[i], np.nan)
+            peak = int(np.nanargmax(extreme) if rising else np.nanargmin(extreme))
+            region = regions[i]
+            results.append({
+                "region": self.region_names[level][region],
+                "district": self.region_districts[level][region],
+                "value": float(per_day[i, peak]),
+                "date": self.store.dates[days[peak]],
+                "locations": int(location_counts[region]) if location_counts is not None else None,
+            })
+        results.sort(key=lambda result: -result["value"] if rising else result["value"])
+        return results
+
+
+# --- Questions ---
+def _find_alias(text, aliases):
+    for name, words in aliases.items():
+        for word in words:
+            if re.search(rf"\b{re.escape(word)}\b", text):
+                return name
+    return None
+
+
+def parse_regional_query(user_input):
+    """Recognizes a regional or alert question. Returns a query dict, or None for anything else.
+
+    Examples: "which mandals in KURNOOL expect more than 2 units of rain on 11-04-25",
+    "max wind speed per district", "villages with heat index above 45".
+    """
+    text = user_input.strip().lower()
+    level_match = LEVEL_PATTERN.search(text)
+    param = _find_alias(text, PARAMETER_ALIASES)
+    if not level_match or not param:
+        return None
+    aggregate = _find_alias(text, AGGREGATE_ALIASES)
+    comparison = COMPARISON_PATTERN.search(text)
+    if not comparison and not aggregate:
+        return None
+    level = {"location": "VILLAGE"}.get(level_match.group(1).lower(), level_match.group(1).upper())
+
+    query_dates = DATE_PATTERN.findall(text) or None
+    within = REGION_FILTER_PATTERN.search(user_input.strip())
+    query = {
+        "level": level,
+        "param": param,
+        "aggregate": aggregate,
+        "dates": query_dates,
+        "within": within.group("name").strip() if within else None,
+    }
+    if comparison:
+        op = comparison.group("op").lower()
+        query.update({"kind": "alert", "op": COMPARISON_WORDS.get(op, op), "threshold": float(comparison.group("value"))})
+    else:
+        query.update({"kind": "rollup", "op": None, "threshold": None})
+    return query
+
+
+def answer_regional_query(stats, query):
+    """Runs a parsed query. Returns {"query", "title", "columns", "rows"} with rows as plain dicts."""
+    level, param, aggregate = query["level"], query["param"], query["aggregate"]
+    dates = query["dates"]
+    period = ", ".join(dates) if dates else f"{stats.store.dates[0]} to {stats.store.dates[-1]}"
+    scope = f" in {query['within']}" if query["within"] else ""
+    if not stats.store.has_parameter(param):
+        raise ValueError(f"{param} data is not loaded.")
+
+    if query["kind"] == "rollup":
+        if level == "VILLAGE":
+            raise ValueError("Rollups are available per district or mandal.")
+        rows = stats.rollup(level, param, aggregate, dates, query["within"])
+        rows.sort(key=lambda row: -row["value"] if aggregate != "min" else row["value"])
+        title = f"{AGGREGATE_LABELS[aggregate]} {param} per {level.lower()}{scope}, {period}"
+        columns = ["region", "district", "value"] if level == "MANDAL" else ["region", "value"]
+    elif level == "VILLAGE":
+        rows = stats.scan_locations(param, query["op"], query["threshold"], dates, query["within"])
+        title = f"Locations{scope} with {param} {query['op']} {query['threshold']:g}, {period}"
+        columns = ["village", "mandal", "district", "peak_date", "peak_value"]
+    else:
+        rows = stats.scan_regions(level, param, query["op"], query["threshold"], dates, query["within"], aggregate)
+        basis = f"{AGGREGATE_LABELS[aggregate].lower()} " if aggregate else ""
+        title = f"{level.title()}s{scope} with {basis}{param} {query['op']} {query['threshold']:g}, {period}"
+        columns = (["region", "district"] if level == "MANDAL" else ["region"]) + ["value", "date"] + ([] if aggregate else ["locations"])
+    return {"query": query, "title": title, "columns": columns, "rows": rows}
+
+
+def format_regional_result(result, limit=REGIONAL_RESULT_LIMIT):
+    """Formats a regional answer as a short plain-text table."""
+    rows = result["rows"]
+    lines = [f"{result['title']}: {len(rows)} result(s)."]
+    for row in rows[:limit]:
+        cells = []
+        for column in result["columns"]:
+            value = row[column]
+            if isinstance(value, float):
+                cells.append("n/a" if np.isnan(value) else f"{value:.2f}")
+            elif column == "locations":
+                cells.append(f"{value} location(s)")
+            else:
+                cells.append(str(value))
+        lines.append("  " + " | ".join(cells))
+    if len(rows) > limit:
+        lines.append(f"  ...and {len(rows) - limit} more.")
+    return "\n".join(lines)
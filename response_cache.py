@@ -0,0 +1,136 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from instrumentation import current_trace
+
+# --- Configuration ---
+RESPONSE_CACHE_SIZE = 1024  # Entries kept in memory
+RESPONSE_CACHE_TTL_SECONDS = 6 * 60 * 60  # Runs are published several times a day
+
+
+class ResponseCache:
+    """Two-tier cache for per-location forecast data and synthesized reports.
+
+    The first tier is an in-memory LRU; the optional second tier is a SQLite
+    file that survives restarts and can be shared by several processes. Entries
+    are keyed by (forecast run, data version, canonical location, parameters,
+    kind) and expire after ttl_seconds. Values must be JSON-serializable.
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE, ttl_seconds=RESPONSE_CACHE_TTL_SECONDS, db_path=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()  # key -> (created, run, value)
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expired": 0, "invalidated": 0}
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, run TEXT NOT NULL, created REAL NOT NULL, value TEXT NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_run ON responses (run)")
+            self._db.commit()
+
+    @staticmethod
+    def make_key(store, location, parameters, kind):
+        """Builds the cache key. location should be canonical (e.g. the normalized resolved name)."""
+        run = f"{store.run_id}@{store.data_version}"
+        return f"{run}|{location}|{','.join(parameters)}|{kind}", run
+
+    # --- Lookup ---
+    def get(self, store, location, parameters, kind):
+        """Returns the cached value or None. The outcome is recorded in the current query trace."""
+        value, tier = self._lookup(store, location, parameters, kind)
+        trace = current_trace()
+        if trace is not None:
+            trace.record_cache(kind, tier)
+        return value
+
+    def _lookup(self, store, location, parameters, kind):
+        """Returns (value, "memory" | "disk"), or (None, "miss")."""
+        key, _ = self.make_key(store, location, parameters, kind)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, run, value = entry
+                if now - created <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return value, "memory"
+                del self._memory[key]
+                self._stats["expired"] += 1
+
+            if self._db is not None:
+                row = self._db.execute("SELECT run, created, value FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    run, created, value = row
+                    if now - created <= self.ttl_seconds:
+                        value = json.loads(value)
+                        self._remember(key, created, run, value)
+                        self._stats["disk_hits"] += 1
+                        return value, "disk"
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+                    self._stats["expired"] += 1
+
+            self._stats["misses"] += 1
+            return None, "miss"
+
+    def put(self, store, location, parameters, kind, value):
+        key, run = self.make_key(store, location, parameters, kind)
+        created = time.time()
+        with self._lock:
+            self._remember(key, created, run, value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, run, created, value) VALUES (?, ?, ?, ?)",
+                    (key, run, created, json.dumps(value, ensure_ascii=False)),
+                )
+                self._db.commit()
+
+    def _remember(self, key, created, run, value):
+        self._memory[key] = (created, run, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    # --- Invalidation ---
+    def activate_run(self, store):
+        """Drops every entry that was not produced from store's run and data version.
+
+        Call whenever a forecast run is (re)loaded; re-ingesting a run with new
+        files changes its data version, so its old entries are dropped as well.
+        """
+        _, current = self.make_key(store, "", (), "")
+        with self._lock:
+            stale = [key for key, (_, run, _) in self._memory.items() if run != current]
+            for key in stale:
+                del self._memory[key]
+            removed = len(stale)
+            if self._db is not None:
+                removed += self._db.execute("DELETE FROM responses WHERE run != ?", (current,)).rowcount
+                self._db.commit()
+            self._stats["invalidated"] += removed
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    # --- Statistics ---
+    def stats(self):
+        """Returns hit/miss counters, the hit rate and the number of entries in memory."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 3) if lookups else 0.0
+        return stats
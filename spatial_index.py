@@ -0,0 +1,154 @@
+import re
+import numpy as np
+
+# --- Configuration ---
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.195
+# Grid cell size in degrees (about 11 km); a cell holds a few dozen villages at the dataset's density
+GRID_CELL_DEGREES = 0.1
+# Villages returned for a "near <lat>, <lon>" query
+NEAREST_COUNT = 5
+# Inverse-distance weighting exponent for interpolated forecasts
+IDW_POWER = 2
+# Points closer than this are treated as the location itself (no interpolation)
+IDW_EXACT_KM = 0.01
+
+# "near 15.89, 80.04", "15.89 80.04", "forecast near 15.89,80.04 within 10 km"
+SPATIAL_QUERY_PATTERN = re.compile(
+    r"^\s*(?:(?:forecast|weather)\s+)?(?:near|at|around)?\s*"
+    r"(?P<lat>[-+]?\d{1,2}(?:\.\d+)?)\s*[,\s]\s*(?P<lon>[-+]?\d{1,3}(?:\.\d+)?)"
+    r"(?:\s*,?\s*within\s+(?P<radius>\d+(?:\.\d+)?)\s*(?:km|kms|kilometers|kilometres)?)?\s*$",
+    re.IGNORECASE,
+)
+
+
+def parse_spatial_query(user_input):
+    """Parses a coordinate query. Returns (lat, lon, radius_km or None), or None if user_input is not one."""
+    match = SPATIAL_QUERY_PATTERN.match(user_input)
+    if not match:
+        return None
+    lat, lon = float(match.group("lat")), float(match.group("lon"))
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    radius = match.group("radius")
+    return lat, lon, float(radius) if radius else None
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Great-circle distances in km from (lat, lon) to every point of the lats/lons arrays."""
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class SpatialIndex:
+    """Uniform LON/LAT grid over the forecast locations for nearest and within-radius queries.
+
+    Rows are sorted by row-major cell number, so the cells of one grid row form
+    one contiguous slice and a bounding box is gathered with one slice per grid
+    row. Only the gathered candidates get exact haversine distances. Results are
+    store row offsets, like LocationIndex.search.
+    """
+
+    def __init__(self, lons, lats, cell_degrees=GRID_CELL_DEGREES):
+        lons = np.asarray(lons, dtype=np.float64)
+        lats = np.asarray(lats, dtype=np.float64)
+        rows = np.flatnonzero(~(np.isnan(lons) | np.isnan(lats)))
+        self.cell_degrees = cell_degrees
+        self.lon0 = float(lons[rows].min()) if len(rows) else 0.0
+        self.lat0 = float(lats[rows].min()) if len(rows) else 0.0
+        cols = np.floor((lons[rows] - self.lon0) / cell_degrees).astype(np.int64)
+        grid_rows = np.floor((lats[rows] - self.lat0) / cell_degrees).astype(np.int64)
+        self.n_cols = int(cols.max()) + 1 if len(rows) else 1
+        self.n_rows = int(grid_rows.max()) + 1 if len(rows) else 1
+
+        cells = grid_rows * self.n_cols + cols
+        order = np.argsort(cells, kind="stable")
+        self.rows = rows[order]
+        self.lons = lons[self.rows]
+        self.lats = lats[self.rows]
+        # cell_starts[c]:cell_starts[c + 1] is the slice of cell c
+        self.cell_starts = np.searchsorted(cells[order], np.arange(self.n_rows * self.n_cols + 1))
+
+    @classmethod
+    def from_store(cls, store, cell_degrees=GRID_CELL_DEGREES):
+        return cls(store.metadata["LON"].to_numpy(), store.metadata["LAT"].to_numpy(), cell_degrees)
+
+    def __len__(self):
+        return len(self.rows)
+
+    # --- Grid ---
+    def _cell_range(self, value, origin, radius_degrees, n_cells):
+        first = int(np.floor((value - radius_degrees - origin) / self.cell_degrees))
+        last = int(np.floor((value + radius_degrees - origin) / self.cell_degrees))
+        return max(first, 0), min(last, n_cells - 1)
+
+    def _box_positions(self, lat, lon, radius_km):
+        """Positions (into self.rows) of the points in the grid cells overlapping the circle's bounding box.
+
+        Also returns whether the box covers the whole grid.
+        """
+        lat_degrees = radius_km / KM_PER_DEGREE_LAT
+        cos_lat = max(np.cos(np.radians(min(abs(lat) + lat_degrees, 90.0))), 1e-6)
+        lon_degrees = min(lat_degrees / cos_lat, 360.0)
+        first_col, last_col = self._cell_range(lon, self.lon0, lon_degrees, self.n_cols)
+        first_row, last_row = self._cell_range(lat, self.lat0, lat_degrees, self.n_rows)
+        covers_grid = first_col == 0 and first_row == 0 and last_col == self.n_cols - 1 and last_row == self.n_rows - 1
+        if first_col > last_col or first_row > last_row:
+            return np.empty(0, dtype=np.int64), covers_grid
+        starts = self.cell_starts[np.arange(first_row, last_row + 1) * self.n_cols + first_col]
+        ends = self.cell_starts[np.arange(first_row, last_row + 1) * self.n_cols + last_col + 1]
+        positions = [np.arange(start, end) for start, end in zip(starts, ends) if end > start]
+        return (np.concatenate(positions) if positions else np.empty(0, dtype=np.int64)), covers_grid
+
+    # --- Queries ---
+    def within(self, lat, lon, radius_km):
+        """Returns (rows, distances_km) of every location within radius_km of (lat, lon), nearest first."""
+        positions, _ = self._box_positions(lat, lon, radius_km)
+        distances = haversine_km(lat, lon, self.lats[positions], self.lons[positions])
+        inside = distances <= radius_km
+        positions, distances = positions[inside], distances[inside]
+        order = np.argsort(distances, kind="stable")
+        return self.rows[positions[order]], distances[order]
+
+    def nearest(self, lat, lon, k=NEAREST_COUNT):
+        """Returns (rows, distances_km) of the k locations nearest to (lat, lon), nearest first.
+
+        The search radius starts at one grid cell and doubles until k points lie
+        inside it, so a query costs a few cells' worth of distance computations.
+        """
+        if not len(self.rows) or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        radius_km = self.cell_degrees * KM_PER_DEGREE_LAT
+        while True:
+            positions, covers_grid = self._box_positions(lat, lon, radius_km)
+            distances = haversine_km(lat, lon, self.lats[positions], self.lons[positions])
+            # Only points inside the circle are guaranteed to be nearer than everything outside the box
+            inside = np.count_nonzero(distances <= radius_km)
+            if inside >= k or covers_grid:
+                order = np.argsort(distances, kind="stable")[:k]
+                return self.rows[positions[order]], distances[order]
+            radius_km *= 2
+
+
+# --- Interpolation ---
+def idw_interpolate(values, distances, power=IDW_POWER):
+    """Inverse-distance-weighted average of values (n_points, ...) at distances (n_points,) km.
+
+    A point closer than IDW_EXACT_KM is returned as is. Missing (NaN) values are
+    left out of the average for their parameter and day.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    distances = np.asarray(distances, dtype=np.float64)
+    if not len(distances):
+        return np.full(values.shape[1:], np.nan)
+    if distances[0] < IDW_EXACT_KM:
+        return values[0]
+    weights = 1.0 / distances ** power
+    weights = weights.reshape((-1,) + (1,) * (values.ndim - 1))
+    known = ~np.isnan(values)
+    total = np.where(known, weights, 0.0).sum(axis=0)
+    weighted = np.where(known, values * weights, 0.0).sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(total > 0, weighted / total, np.nan)
@@ -0,0 +1,220 @@
+import os
+from forecast_store import PARAMETER_FILE_PREFIXES, format_rows, format_data_line
+from location_index import normalize_name
+from spatial_index import NEAREST_COUNT, idw_interpolate
+from concurrent_fetch import fetch_all
+from narrative import render_report
+from instrumentation import trace_callback_handler
+from regional_stats import format_regional_result
+
+# --- Configuration ---
+# Gemini model used for the final report. gemini-1.5-flash balances capability and speed.
+LLM_MODEL = "gemini-1.5-flash"
+LLM_TEMPERATURE = 0.2
+
+# Parameters covered by a report, in the order they appear in the synthesis prompt
+REPORT_PARAMETERS = list(PARAMETER_FILE_PREFIXES)
+
+# --- Synthesis Modes ---
+# "llm":      Gemini writes the report from the synthesis prompt
+# "template": the report is rendered locally from the data (narrative.py), no LLM call
+# "auto":     Gemini, falling back to the template if it fails or takes longer than SYNTHESIS_TIMEOUT_SECONDS
+SYNTHESIS_MODES = ("llm", "template", "auto")
+SYNTHESIS_TIMEOUT_SECONDS = 20
+
+
+# --- LLM ---
+def create_llm(temperature=LLM_TEMPERATURE):
+    """Creates the Gemini chat model used for report synthesis (reads GOOGLE_API_KEY from .env).
+
+    Every call made through it, including the CSV agents' calls, is recorded in the current query trace.
+    """
+    from dotenv import load_dotenv
+    import google.generativeai as genai
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    load_dotenv()
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        raise ValueError("GOOGLE_API_KEY not found in environment variables. Please set it in a .env file.")
+    genai.configure(api_key=api_key)
+    return ChatGoogleGenerativeAI(model=LLM_MODEL, temperature=temperature, callbacks=[trace_callback_handler()])
+
+
+# --- Location Resolution ---
+def resolve_location(location_index, user_input):
+    """Finds the rows for user_input, falling back to the closest fuzzy match.
+
+    Returns (rows, resolved_name, candidates). resolved_name is None when
+    user_input matched directly; otherwise it is the fuzzy match that was used
+    and candidates holds the ranked (name, level, score) alternatives.
+    """
+    rows = location_index.search(user_input)
+    if len(rows):
+        return rows, None, ()
+    candidates = location_index.fuzzy_candidates(user_input)
+    if not candidates:
+        return rows, None, ()
+    best_name = candidates[0][0]
+    return location_index.search(best_name, mode="exact"), best_name, candidates
+
+
+def canonical_location(user_input, resolved_name=None):
+    """Returns the cache identity of a query: the same matches always give the same string."""
+    if resolved_name:
+        return f"exact:{normalize_name(resolved_name)}"
+    return f"substring:{normalize_name(user_input)}"
+
+
+def resolve_coordinates(spatial_index, lat, lon, radius_km=None):
+    """Finds the locations near (lat, lon): the NEAREST_COUNT nearest, or all within radius_km.
+
+    Returns (rows, distances_km, canonical location), nearest first.
+    """
+    if radius_km is None:
+        rows, distances = spatial_index.nearest(lat, lon, NEAREST_COUNT)
+        return rows, distances, f"point:{lat:.4f},{lon:.4f}:nearest{NEAREST_COUNT}"
+    rows, distances = spatial_index.within(lat, lon, radius_km)
+    return rows, distances, f"point:{lat:.4f},{lon:.4f}:within{radius_km:g}"
+
+
+def forecast_period(store):
+    """Returns the first and last forecast date of store ("start date"/"end date" if no date columns were detected)."""
+    return (store.dates[0], store.dates[-1]) if store.dates else ("start date", "end date")
+
+
+def describe_point(lat, lon):
+    return f"{lat:.4f}, {lon:.4f}"
+
+
+# --- Data Collection ---
+def collect_forecast_data(store, rows, user_input):
+    """Formats the data strings for every report parameter.
+
+    Returns (raw_results, location_found_somewhere), the same shape the CSV agents produce.
+    """
+    formatted = format_rows(store, rows)
+    raw_results = {}
+    for param in REPORT_PARAMETERS:
+        if not store.has_parameter(param):
+            raw_results[param] = f"{param} forecast unavailable (Data not loaded)."
+        elif formatted[param] is None:
+            raw_results[param] = f"Location '{user_input}' not found."
+        else:
+            raw_results[param] = formatted[param]
+    return raw_results, len(rows) > 0
+
+
+def collect_point_data(store, rows, distances, lat, lon, interpolate=True):
+    """Like collect_forecast_data for the locations around (lat, lon), nearest first.
+
+    With interpolate, every parameter's data string starts with an inverse-distance-weighted
+    estimate at the point itself, so it is the location the report describes.
+    """
+    point = describe_point(lat, lon)
+    raw_results, location_found_somewhere = collect_forecast_data(store, rows, point)
+    if interpolate and location_found_somewhere:
+        estimate = idw_interpolate(store.values[rows], distances)
+        label = f"{point} (interpolated from {len(rows)} nearby locations)"
+        for param in REPORT_PARAMETERS:
+            if store.has_parameter(param):
+                line = format_data_line(label, store.dates, estimate[store.parameter_positions[param]])
+                raw_results[param] = f"{line}\n{raw_results[param]}"
+    return raw_results, location_found_somewhere
+
+
+# --- Synthesis Prompt - For Combining Results ---
+def build_synthesis_prompt(user_input, raw_results, forecast_start_date, forecast_end_date):
+    """Builds the prompt that turns the per-parameter data strings into one narrative report."""
+    return f"""
+            You are a weather report compiler. Synthesize the following forecast data fragments for the user query '{user_input}' into a single, easy-to-read report using a simple narrative style.
+
+            Forecast Period: {forecast_start_date} to {forecast_end_date}
+
+            Data Fragments Provided:
+            - Rainfall Data String: {raw_results.get("Rainfall", "Not Available")}
+            - Humidity Data String: {raw_results.get("Humidity", "Not Available")}
+            - Wind Speed Data String: {raw_results.get("Wind Speed", "Not Available")}
+            - Temperature Data String: {raw_results.get("Temperature", "Not Available")}
+            - Heat Index Data String: {raw_results.get("Heat Index", "Not Available")}
+
+            Instructions for the Final Report:
+            1.  Identify the primary location details (Village, Mandal, District) from the fragments containing valid data (look for "Location:" and "Data:"). Use the first complete location found.
+            2.  If no valid data fragments exist, state forecast is unavailable.
+            3.  Format the report:
+                *   Title: **Local Weather Forecast**
+                *   Location: **Location:** Village Name, Mandal Name, District Name.
+                *   Outlook Period: **Outlook ({forecast_start_date} - {forecast_end_date}):**
+                *   Summary Paragraph: Concisely interpret the data from the VALID fragments:
+                    *   **Rainfall:** Describe expected rain ("Light showers...", "Dry conditions...", "Rainfall around [Value] units on [Date]..."). State if unavailable.
+                    *   **Humidity:** Describe humidity levels ("Relative humidity around X-Y%...", "Higher humidity expected...", "Moderate levels..."). State if unavailable. (Assume %).
+                    *   **Wind Speed:** Describe wind conditions ("Winds light/moderate/strong (X-Y units)...", "Strongest winds on [Date]..."). Specify units like km/h if known/implied. State if unavailable.
+                    *   **Temperature:** Describe temperature trends ("Temperatures expected around X-Y degrees [specify C/F if known]...", "Cooler towards [Date]...", "Temperatures peaking near..."). State if unavailable.
+                    *   **Heat Index:** Describe how hot it will feel ("Feels-like temperatures around X-Y degrees...", "Most uncomfortable on [Date]..."). State if unavailable.
+                    *   Combine these points smoothly into one or two narrative paragraphs.
+            4.  Interpret the data, don't just list it. Report ONLY based on provided fragments. Handle missing parameters gracefully. Do not mention the source strings or agents.
+
+            Generate the final synthesized weather report now.
+            """
+
+
+def build_regional_prompt(user_input, result_text):
+    """Builds the prompt that turns a regional/alert query result into a short answer."""
+    return f"""
+            You are a weather analyst. Answer the user's question '{user_input}' using ONLY the computed results below.
+
+            Computed Results:
+            {result_text}
+
+            Instructions:
+            1.  Start with a one-sentence direct answer (e.g. how many regions qualify and which stand out).
+            2.  Then list the most notable regions or locations with their values and dates, at most ten.
+            3.  If there are no results, say that no region or location meets the condition.
+            4.  Do not invent values or regions that are not in the results. Do not mention how the results were computed.
+            """
+
+
+# --- Synthesis ---
+def invoke_synthesis(llm, prompt, mode, timeout):
+    """Runs the synthesis prompt for an "llm" or "auto" mode. Returns the text, or None if "auto" should fall back."""
+    if mode == "llm":
+        return llm.invoke(prompt).content
+    status, response = fetch_all({"synthesis": lambda: llm.invoke(prompt)}, timeout)["synthesis"]
+    if status == "ok":
+        return response.content
+    print(f"LLM synthesis {'timed out' if status == 'timeout' else 'failed'}; using the template report.")
+    return None
+
+
+def synthesize_report(llm, store, rows, user_input, raw_results, mode="llm", timeout=SYNTHESIS_TIMEOUT_SECONDS, point=None):
+    """Produces the final report text for the matched rows using the given synthesis mode.
+
+    point is (lat, lon, distances_km) for an interpolated coordinate query (see render_report).
+    Returns (report, mode_used); mode_used is "template" whenever the fallback was taken.
+    """
+    if mode not in SYNTHESIS_MODES:
+        raise ValueError(f"Unknown synthesis mode: {mode}")
+    if mode == "template" or llm is None:
+        return render_report(store, rows, point), "template"
+
+    synthesis_prompt = build_synthesis_prompt(user_input, raw_results, *forecast_period(store))
+    report = invoke_synthesis(llm, synthesis_prompt, mode, timeout)
+    if report is not None:
+        return report, "llm"
+    return render_report(store, rows, point), "template"
+
+
+def synthesize_regional_answer(llm, user_input, result, mode="llm", timeout=SYNTHESIS_TIMEOUT_SECONDS):
+    """Produces the answer to a regional/alert question from its computed result.
+
+    The template answer is the formatted result table. Returns (answer, mode_used).
+    """
+    if mode not in SYNTHESIS_MODES:
+        raise ValueError(f"Unknown synthesis mode: {mode}")
+    result_text = format_regional_result(result)
+    if mode == "template" or llm is None:
+        return result_text, "template"
+    answer = invoke_synthesis(llm, build_regional_prompt(user_input, result_text), mode, timeout)
+    if answer is not None:
+        return answer, "llm"
+    return result_text, "template"
@@ -0,0 +1,343 @@
+import argparse
+import asyncio
+import json
+import os
+import traceback
+from contextlib import asynccontextmanager
+
+try:
+    from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+    from fastapi.responses import StreamingResponse
+except ImportError as e:
+    raise ImportError("weather_server.py needs FastAPI and uvicorn: pip install fastapi uvicorn") from e
+
+from components import LazyComponents
+from forecast_runs import ForecastRunManager
+from instrumentation import Tracer
+from forecast_store import location_records
+from narrative import render_report
+from regional_stats import parse_regional_query, answer_regional_query, format_regional_result
+from response_cache import ResponseCache
+from spatial_index import parse_spatial_query
+from weather_report import (
+    create_llm, resolve_location, canonical_location, collect_forecast_data, resolve_coordinates, collect_point_data,
+    describe_point, forecast_period, build_synthesis_prompt, build_regional_prompt, REPORT_PARAMETERS, SYNTHESIS_MODES, SYNTHESIS_TIMEOUT_SECONDS,
+)
+
+# --- Configuration ---
+# The workers are separate processes, so settings reach them through the environment (see main()).
+DATA_DIR = os.environ.get("WEATHER_DATA_DIR", "/Users/sravva/Documents/Test/aware")
+SYNTHESIS_MODE = os.environ.get("WEATHER_SYNTHESIS_MODE", "auto")
+# JSONL file each worker appends one trace per question to (unset: only the rolling percentiles at /metrics)
+TRACE_LOG_PATH = os.environ.get("WEATHER_TRACE_LOG")
+# Streamed LLM syntheses in flight at once per worker; further requests wait for a slot
+LLM_MAX_CONCURRENCY = 16
+# Locations returned with each report (the report itself describes the first)
+RESPONSE_LOCATION_LIMIT = 5
+# Create the LLM client and the run's spatial index and rollups before taking requests ("0": on first use)
+PRELOAD = os.environ.get("WEATHER_PRELOAD", "1") != "0"
+# Whether this process parses new runs' CSVs and writes their snapshots. main() turns it off in the
+# workers and ingests in the parent instead, so a new run is parsed once, not once per worker.
+INGEST = os.environ.get("WEATHER_INGEST", "1") != "0"
+SERVER_HOST = "0.0.0.0"
+SERVER_PORT = 8000
+SERVER_WORKERS = 4
+
+
+# --- Shared State (one per worker process) ---
+# Every connection of a worker uses the same run manager, LLM client, limiter and cache. The forecast
+# values are memory-mapped from the run's snapshot, so the workers also share one copy in the page cache.
+class ServerState:
+    run_manager = None
+    components = None  # "llm"
+    llm_slots = None
+    response_cache = None
+    tracer = None
+
+
+state = ServerState()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    state.components = LazyComponents()
+    state.components.register("llm", create_llm)
+    state.run_manager = ForecastRunManager(DATA_DIR, preload=PRELOAD, snapshot_only=not INGEST)
+    state.response_cache = ResponseCache()
+    state.tracer = Tracer(TRACE_LOG_PATH)
+    state.run_manager.add_listener(lambda run: state.response_cache.activate_run(run.store))
+    await asyncio.to_thread(state.run_manager.load_latest)
+    state.run_manager.start()
+    if PRELOAD and SYNTHESIS_MODE != "template":
+        try:
+            await asyncio.to_thread(state.components.preload, ["llm"])
+        except Exception as e:
+            # In "auto" mode the template report is served until the client can be created (retried per request)
+            if SYNTHESIS_MODE != "auto":
+                raise
+            print(f"Warning: LLM client unavailable ({e}); serving template reports.")
+    state.llm_slots = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    yield
+    state.run_manager.stop()
+    state.tracer.close()
+
+
+app = FastAPI(title="Multi-Parameter Weather Forecast API", lifespan=lifespan)
+
+
+# --- Query Planning ---
+def plan_reply(run, user_input):
+    """Resolves user_input against run without calling the LLM.
+
+    Returns a dict with "meta" (what was matched, JSON-serializable), "location"
+    and "kind" (the response cache key parts), "prompt" (the synthesis prompt) and
+    "fallback" (the template text). "error" is set instead when nothing matched.
+    """
+    store = run.store
+    regional_query = parse_regional_query(user_input)
+    if regional_query:
+        try:
+            result = answer_regional_query(run.regional_stats, regional_query)
+        except ValueError as e:
+            return {"error": str(e)}
+        result_text = format_regional_result(result)
+        return {
+            "meta": {"type": "regional", "title": result["title"], "columns": result["columns"], "rows": result["rows"][:RESPONSE_LOCATION_LIMIT * 5], "result_count": len(result["rows"])},
+            "location": "regional:" + json.dumps(regional_query, sort_keys=True),
+            "kind": "report:regional",
+            "prompt": build_regional_prompt(user_input, result_text),
+            "fallback": result_text,
+        }
+
+    spatial_query = parse_spatial_query(user_input)
+    if spatial_query:
+        lat, lon, radius_km = spatial_query
+        rows, distances, location = resolve_coordinates(run.spatial_index, lat, lon, radius_km)
+        if not len(rows):
+            scope = f"within {radius_km:g} km of" if radius_km is not None else "near"
+            return {"error": f"No forecast locations {scope} {describe_point(lat, lon)}."}
+        raw_results, _ = collect_point_data(store, rows, distances, lat, lon)
+        locations = location_records(store, rows, RESPONSE_LOCATION_LIMIT)
+        for record, distance in zip(locations, distances):
+            record["distance_km"] = round(float(distance), 2)
+        meta = {"type": "point", "lat": lat, "lon": lon, "radius_km": radius_km, "match_count": len(rows), "locations": locations}
+    else:
+        rows, resolved_name, candidates = resolve_location(run.location_index, user_input)
+        raw_results, found = collect_forecast_data(store, rows, user_input)
+        if not found:
+            return {"error": f"Location '{user_input}' not found in any available forecast dataset."}
+        location = canonical_location(user_input, resolved_name)
+        meta = {
+            "type": "location",
+            "resolved_name": resolved_name,
+            "candidates": [{"name": name, "level": level, "score": round(score, 3)} for name, level, score in candidates],
+            "match_count": len(rows),
+            "locations": location_records(store, rows, RESPONSE_LOCATION_LIMIT),
+        }
+    return {
+        "meta": meta,
+        "location": location,
+        "kind": "report:native:idw" if spatial_query else "report:native",
+        "prompt": build_synthesis_prompt(user_input, raw_results, *forecast_period(store)),
+        "fallback": render_report(store, rows, (lat, lon, distances) if spatial_query else None),
+    }
+
+
+# --- Streaming Synthesis ---
+async def reply_events(user_input, mode=SYNTHESIS_MODE):
+    """Yields (event, data) pairs for one question: "meta", then "token" chunks, then "done" (or "error").
+
+    The LLM output is streamed as it is generated. In "auto" mode the template text is
+    sent instead if the first chunk does not arrive within SYNTHESIS_TIMEOUT_SECONDS or
+    the LLM fails before sending anything. Every question is traced (see /metrics).
+    """
+    trace = state.tracer.begin(user_input, synthesis_mode=mode)
+    try:
+        async for event, data in _reply_events(trace, user_input, mode):
+            if event == "error":
+                trace.status = "error"
+                trace.set(error=data["message"])
+            elif event == "done":
+                trace.set(reply_mode=data["mode"])
+            yield event, data
+    except BaseException:
+        trace.status = "error"
+        raise
+    finally:
+        state.tracer.finish(trace)
+
+
+async def _reply_events(trace, user_input, mode):
+    if mode not in SYNTHESIS_MODES:
+        yield "error", {"message": f"Unknown synthesis mode: {mode}"}
+        return
+    run = state.run_manager.current()
+    if run is None:
+        yield "error", {"message": "No forecast data is loaded."}
+        return
+    trace.set(run_id=run.run_id)
+    # Lookup and formatting take a few milliseconds; off the event loop they don't stall other streams
+    with trace.stage("resolve"):
+        plan = await asyncio.to_thread(plan_reply, run, user_input)
+    if "error" in plan:
+        yield "error", {"message": plan["error"]}
+        return
+    yield "meta", dict(plan["meta"], run_id=run.run_id, forecast_start=run.start_date, forecast_end=run.end_date)
+
+    cache_kind = f"{plan['kind']}:{mode}"
+    cached = state.response_cache.get(run.store, plan["location"], REPORT_PARAMETERS, cache_kind)
+    if cached is not None:
+        yield "token", {"text": cached}
+        yield "done", {"mode": "cache"}
+        return
+
+    # A server started in template mode never creates the LLM client
+    if mode == "template" or SYNTHESIS_MODE == "template":
+        state.response_cache.put(run.store, plan["location"], REPORT_PARAMETERS, cache_kind, plan["fallback"])
+        yield "token", {"text": plan["fallback"]}
+        yield "done", {"mode": "template"}
+        return
+
+    parts = []
+    with trace.stage("llm_slot_wait"):
+        await state.llm_slots.acquire()
+    try:
+        with trace.stage("synthesis") as record:
+            stream = None
+            try:
+                llm = state.components.get("llm") if state.components.is_loaded("llm") else await asyncio.to_thread(state.components.get, "llm")
+                stream = llm.astream(plan["prompt"]).__aiter__()
+                first_timeout = SYNTHESIS_TIMEOUT_SECONDS if mode == "auto" else None
+                chunk = await asyncio.wait_for(stream.__anext__(), first_timeout)
+                record["first_token_ms"] = round(trace.elapsed_ms() - record["start_ms"], 3)
+                while True:
+                    if chunk.content:
+                        parts.append(chunk.content)
+                        yield "token", {"text": chunk.content}
+                    chunk = await stream.__anext__()
+            except StopAsyncIteration:
+                pass
+            except Exception as e:
+                record["status"] = "error"
+                record["error"] = repr(e)
+                if parts or mode != "auto":
+                    yield "error", {"message": f"Report synthesis failed: {e}"}
+                    return
+                print(f"LLM synthesis {'timed out' if isinstance(e, asyncio.TimeoutError) else f'failed ({e})'}; using the template report.")
+                yield "token", {"text": plan["fallback"]}
+                yield "done", {"mode": "template"}
+                return
+            finally:
+                close = getattr(stream, "aclose", None)
+                if close:
+                    await close()
+    finally:
+        state.llm_slots.release()
+    state.response_cache.put(run.store, plan["location"], REPORT_PARAMETERS, cache_kind, "".join(parts))
+    yield "done", {"mode": "llm"}
+
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+# --- Endpoints ---
+@app.get("/health")
+async def health():
+    run = state.run_manager.current()
+    if run is None:
+        raise HTTPException(status_code=503, detail="No forecast data is loaded.")
+    return {"run_id": run.run_id, "forecast_start": run.start_date, "forecast_end": run.end_date, "locations": len(run.store), "parameters": run.store.parameters}
+
+
+@app.get("/metrics")
+async def metrics():
+    """Rolling p50/p95 latencies per stage (this worker) and the response cache counters."""
+    return {"pid": os.getpid(), "latency": state.tracer.percentiles(), "response_cache": state.response_cache.stats()}
+
+
+@app.get("/forecast")
+async def forecast(q: str, mode: str = SYNTHESIS_MODE):
+    """Answers q (a location, coordinate or regional question) with the whole report in one JSON response."""
+    reply = {"query": q}
+    text = []
+    async for event, data in reply_events(q, mode):
+        if event == "error":
+            raise HTTPException(status_code=404 if "not found" in data["message"] else 400, detail=data["message"])
+        if event == "token":
+            text.append(data["text"])
+        else:
+            reply.update(data)
+    reply["report"] = "".join(text)
+    return reply
+
+
+@app.get("/forecast/stream")
+async def forecast_stream(q: str, mode: str = SYNTHESIS_MODE):
+    """Server-Sent Events: a "meta" event with the matched data, "token" events with the report text, then "done" or "error"."""
+    async def events():
+        try:
+            async for event, data in reply_events(q, mode):
+                yield format_sse(event, data)
+        except Exception as e:
+            print(traceback.format_exc())
+            yield format_sse("error", {"message": str(e)})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.websocket("/ws")
+async def chat_socket(websocket: WebSocket):
+    """Chat over one connection: each text message is a question; replies are streamed as JSON messages {"event", ...data}."""
+    await websocket.accept()
+    try:
+        while True:
+            user_input = (await websocket.receive_text()).strip()
+            if not user_input:
+                await websocket.send_json({"event": "error", "message": "Please enter a location name."})
+                continue
+            try:
+                async for event, data in reply_events(user_input):
+                    await websocket.send_json(dict(data, event=event))
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                print(traceback.format_exc())
+                await websocket.send_json({"event": "error", "message": str(e)})
+    except WebSocketDisconnect:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve weather forecast reports over HTTP, SSE and WebSocket.")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Directory containing the forecast CSVs (and snapshots/)")
+    parser.add_argument("--synthesis", choices=SYNTHESIS_MODES, default=SYNTHESIS_MODE)
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS, help="Worker processes")
+    parser.add_argument("--trace-log", default=TRACE_LOG_PATH, help="Append one JSON trace per question to this file")
+    parser.add_argument("--no-preload", action="store_true", help="Create the LLM client and indexes on first use instead of at startup")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    os.environ["WEATHER_DATA_DIR"] = args.data_dir
+    os.environ["WEATHER_SYNTHESIS_MODE"] = args.synthesis
+    if args.trace_log:
+        os.environ["WEATHER_TRACE_LOG"] = args.trace_log
+    os.environ["WEATHER_PRELOAD"] = "0" if args.no_preload or not PRELOAD else "1"
+    # The parent builds the snapshot of the newest run (and of every later run) once; the workers only map them
+    os.environ["WEATHER_INGEST"] = "0"
+    ingester = ForecastRunManager(args.data_dir)
+    if ingester.load_latest() is None:
+        print(f"Fatal Error: No complete forecast run found in {args.data_dir}.")
+        return
+    ingester.start()
+    try:
+        uvicorn.run("weather_server:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        ingester.stop()
+
+
+if __name__ == "__main__":
+    main()